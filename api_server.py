@@ -1,41 +1,250 @@
 from flask import Flask, request, jsonify
-from flask_cors import CORS 
+from flask_cors import CORS
 import os
 import sys
+import time
+import uuid
+import hashlib
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple
 
-# Import the core analysis function from your modified file
-from git_debt_analyzer import run_analysis_and_return_data 
+# Import the core analysis function
+from git_debt_analyzer import run_analysis_pipeline, PIPELINE_VERSION
+from hotspot_index import SYMBOL_KINDS, select_hotspots
+
+# --- Job Queue Configuration ---
+# Maximum analyses running at once, and maximum jobs waiting behind them
+MAX_CONCURRENT_JOBS = int(os.environ.get('GITDEBT_API_WORKERS', '2'))
+MAX_QUEUED_JOBS = int(os.environ.get('GITDEBT_API_MAX_QUEUED', '50'))
+# Finished jobs (and their results) are kept this long for polling clients
+JOB_RETENTION_SECONDS = int(os.environ.get('GITDEBT_API_JOB_TTL', '3600'))
+# Number of finished results kept, keyed by (repo URL, HEAD SHA, pipeline version)
+RESULT_CACHE_SIZE = int(os.environ.get('GITDEBT_API_RESULT_CACHE_SIZE', '32'))
 
 app = Flask(__name__)
 # IMPORTANT: This allows your HTML file to fetch data from the Flask server
-CORS(app) 
+CORS(app)
+
+executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix='analysis')
+jobs: Dict[str, Dict[str, Any]] = {}
+jobs_lock = threading.Lock()
+
+# Both are guarded by jobs_lock
+inflight_jobs: Dict[Tuple[str, str, str], str] = {}
+result_cache: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+
+
+def resolve_remote_head(repo_url: str) -> Optional[str]:
+    """Returns the SHA the remote HEAD points at, or None if it cannot be resolved."""
+    try:
+        result = subprocess.run(
+            ['git', 'ls-remote', repo_url, 'HEAD'],
+            capture_output=True, text=True, check=False, timeout=30
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0 or not result.stdout.strip():
+        return None
+    return result.stdout.split()[0]
+
+
+def etag_for(cache_key: Tuple[str, str, str]) -> str:
+    return '"' + hashlib.sha256('\0'.join(cache_key).encode('utf-8')).hexdigest()[:32] + '"'
+
+
+def etag_matches(etag: str) -> bool:
+    """True if the request's If-None-Match header lists this ETag (or '*')."""
+    header = request.headers.get('If-None-Match', '')
+    return any(tag.strip() in (etag, '*') for tag in header.split(',') if tag.strip())
+
+
+def cached_result_response(cache_key: Tuple[str, str, str], entry: Dict[str, Any]):
+    """200 with the cached result, or 304 if the client already has this version."""
+    etag = etag_for(cache_key)
+    if etag_matches(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify({
+            'job_id': entry['job_id'],
+            'repo_url': cache_key[0],
+            'head_sha': cache_key[1],
+            'status': 'finished',
+            'cached': True,
+            'result': entry['result'],
+        })
+    response.headers['ETag'] = etag
+    return response
+
+
+def prune_finished_jobs():
+    """Drops finished jobs older than JOB_RETENTION_SECONDS. Caller must hold jobs_lock."""
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    for job_id in [job_id for job_id, job in jobs.items() if job['finished_at'] and job['finished_at'] < cutoff]:
+        del jobs[job_id]
+
+
+def update_job(job_id: str, **fields):
+    with jobs_lock:
+        jobs[job_id].update(fields)
+
+
+def run_job(job_id: str, repo_url: str):
+    """
+    Worker-thread body: runs the pipeline and records progress, result or error on the job.
+
+    The result is cached under the SHA the pipeline actually analyzed ('_head_sha'), which
+    differs from the one resolved at submission time if a push landed in between.
+    """
+    update_job(job_id, status='running', started_at=time.time())
+    try:
+        print(f"API Job {job_id}: Starting analysis for: {repo_url}", file=sys.stderr)
+        results = run_analysis_pipeline(repo_url, progress_callback=lambda stage: update_job(job_id, stage=stage))
+        # Plain dicts for jsonify (the pipeline returns a columnar FileTable)
+        update_job(job_id, status='finished', stage='done', result=results.to_dict(), finished_at=time.time())
+    except Exception as e:
+        print(f"API Error: Analysis failed for {repo_url}. {e}", file=sys.stderr)
+        update_job(job_id, status='failed', error=f"Analysis failed: {str(e)}", finished_at=time.time())
+    finally:
+        with jobs_lock:
+            job = jobs[job_id]
+            if job['cache_key']:
+                inflight_jobs.pop(job['cache_key'], None)
+            if job['status'] == 'finished':
+                analyzed_sha = job['result'].get('_head_sha')
+                cache_key = (repo_url, analyzed_sha, PIPELINE_VERSION) if analyzed_sha else None
+                job['cache_key'] = cache_key
+                if cache_key:
+                    result_cache[cache_key] = {'job_id': job_id, 'result': job['result']}
+                    result_cache.move_to_end(cache_key)
+                    while len(result_cache) > RESULT_CACHE_SIZE:
+                        result_cache.popitem(last=False)
+
+
+def job_summary(job_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public view of a job (everything except the potentially large result)."""
+    return {
+        'job_id': job_id,
+        'repo_url': job['repo_url'],
+        'head_sha': job['cache_key'][1] if job['cache_key'] else None,
+        'status': job['status'],
+        'stage': job['stage'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+    }
+
 
 @app.route('/analyze', methods=['POST'])
 def analyze_repo():
-    """Endpoint to trigger analysis and return JSON results."""
-    data = request.get_json()
+    """
+    Endpoint to enqueue an analysis. Returns a job id to poll at /jobs/<id>.
+
+    Requests for a repo whose remote HEAD was already analyzed are answered from the
+    result cache (honouring If-None-Match). Requests for a HEAD that is currently being
+    analyzed join the running job instead of starting a new one.
+    """
+    data = request.get_json(silent=True) or {}
     repo_url = data.get('repo_url')
-    
+
     if not repo_url:
         return jsonify({"error": "Missing repo_url"}), 400
-        
+
+    head_sha = resolve_remote_head(repo_url)
+    cache_key = (repo_url, head_sha, PIPELINE_VERSION) if head_sha else None
+
+    with jobs_lock:
+        prune_finished_jobs()
+
+        if cache_key in result_cache:
+            result_cache.move_to_end(cache_key)
+            return cached_result_response(cache_key, result_cache[cache_key])
+
+        if cache_key in inflight_jobs:
+            job_id = inflight_jobs[cache_key]
+            response = jsonify({**job_summary(job_id, jobs[job_id]), "status_url": f"/jobs/{job_id}"})
+            response.headers['Location'] = f"/jobs/{job_id}"
+            return response, 202
+
+        pending = sum(1 for job in jobs.values() if job['status'] in ('queued', 'running'))
+        if pending >= MAX_CONCURRENT_JOBS + MAX_QUEUED_JOBS:
+            return jsonify({"error": "Analysis queue is full, retry later"}), 503
+
+        job_id = uuid.uuid4().hex
+        jobs[job_id] = {
+            'repo_url': repo_url,
+            'cache_key': cache_key,
+            'status': 'queued',
+            'stage': 'queued',
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+        }
+        if cache_key:
+            inflight_jobs[cache_key] = job_id
+
+    executor.submit(run_job, job_id, repo_url)
+    print(f"API Request: Queued analysis {job_id} for: {repo_url}", file=sys.stderr)
+
+    response = jsonify({"job_id": job_id, "head_sha": head_sha, "status": "queued", "status_url": f"/jobs/{job_id}"})
+    response.headers['Location'] = f"/jobs/{job_id}"
+    return response, 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id: str):
+    """Returns a job's status and progress stage, plus the result once it has finished."""
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": "Unknown job id"}), 404
+        body = job_summary(job_id, job)
+        if job['status'] == 'finished':
+            body['result'] = job['result']
+
+    if job['status'] != 'finished' or not job['cache_key']:
+        return jsonify(body)
+
+    etag = etag_for(job['cache_key'])
+    response = app.response_class(status=304) if etag_matches(etag) else jsonify(body)
+    response.headers['ETag'] = etag
+    return response
+
+@app.route('/jobs/<job_id>/hotspots', methods=['GET'])
+def get_job_hotspots(job_id: str):
+    """
+    Returns the most complex functions/classes of a finished job, e.g.
+    /jobs/<id>/hotspots?limit=50&kind=function. Served from the job's precomputed
+    hotspot index, so the full result is neither rescanned nor sent.
+    """
+    kind = request.args.get('kind')
+    if kind and kind not in SYMBOL_KINDS:
+        return jsonify({"error": f"kind must be one of {', '.join(SYMBOL_KINDS)}"}), 400
     try:
-        # Run the core analysis and get the JSON data back
-        print(f"API Request: Starting analysis for: {repo_url}", file=sys.stderr)
-        results = run_analysis_and_return_data(repo_url)
-        
-        # Flask automatically serializes the dictionary to JSON
-        return jsonify(results) 
-    except Exception as e:
-        # This catches exceptions from run_analysis_and_return_data
-        print(f"API Error: Analysis failed for {repo_url}. {e}", file=sys.stderr)
-        return jsonify({"error": f"Analysis failed: {str(e)}"}), 500
+        limit = int(request.args.get('limit', '50'))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": "Unknown job id"}), 404
+        if job['status'] != 'finished':
+            return jsonify(job_summary(job_id, job)), 409
+        hotspots = select_hotspots(job['result'].get('_hotspots', []), limit=max(limit, 0), kind=kind)
+
+    return jsonify({'job_id': job_id, 'kind': kind, 'hotspots': hotspots})
 
 @app.route('/', methods=['GET'])
 def home():
     """Simple status check."""
-    return "Git Debt Analyzer API is running on Port 5000. Send POST request with repo_url to /analyze"
+    return "Git Debt Analyzer API is running on Port 5000. POST repo_url to /analyze, then poll GET /jobs/<job_id>"
 
 if __name__ == '__main__':
     # Ensure you have 'pip install flask flask-cors'
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # The reloader of debug mode would start a second copy of the worker pool, so it is opt-in
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get('FLASK_DEBUG') == '1', threaded=True)
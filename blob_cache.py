@@ -0,0 +1,140 @@
+import json
+import os
+import sqlite3
+import subprocess
+import time
+from typing import Dict, Any, Iterable, List, Tuple
+
+# Content-addressed results shared by every repository (forks and vendored copies hit it too)
+BLOB_CACHE_PATH = os.environ.get(
+    'GITDEBT_BLOB_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'gitdebt', 'blob_cache.sqlite')
+)
+BLOB_CACHE_MAX_BYTES = int(os.environ.get('GITDEBT_BLOB_CACHE_MB', '512')) * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    namespace TEXT NOT NULL,
+    blob_key TEXT NOT NULL,
+    result TEXT NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (namespace, blob_key)
+);
+CREATE INDEX IF NOT EXISTS idx_results_last_used ON results (last_used);
+"""
+
+# SQLite's default limit on bound parameters per statement
+_BATCH_SIZE = 900
+
+
+def _next_use_stamps(conn: sqlite3.Connection, count: int) -> List[int]:
+    """
+    `count` increasing 'last_used' values, all newer than any stored one.
+
+    Nanosecond clock readings, bumped past the current maximum if needed, so rows touched
+    in the same call (or the same second) still have a strict LRU order.
+    """
+    latest = conn.execute('SELECT COALESCE(MAX(last_used), 0) FROM results').fetchone()[0]
+    start = max(time.time_ns(), latest + 1)
+    return list(range(start, start + count))
+
+
+def list_blob_ids(repo_path: str) -> Dict[str, str]:
+    """Maps every tracked path (POSIX, relative to the repo root) to its git blob id."""
+    result = subprocess.run(
+        ['git', '-C', repo_path, 'ls-files', '--stage', '-z'],
+        capture_output=True, text=True, encoding='utf-8', errors='replace', check=False
+    )
+    if result.returncode != 0:
+        return {}
+
+    blob_ids: Dict[str, str] = {}
+    for entry in result.stdout.split('\0'):
+        if not entry:
+            continue
+        # "<mode> <object> <stage>\t<path>"
+        meta, _, path = entry.partition('\t')
+        blob_ids[path] = meta.split(' ')[1]
+    return blob_ids
+
+
+def open_blob_cache() -> sqlite3.Connection:
+    """Opens (and creates if needed) the shared blob result cache."""
+    os.makedirs(os.path.dirname(BLOB_CACHE_PATH), exist_ok=True)
+    conn = sqlite3.connect(BLOB_CACHE_PATH, timeout=60, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def get_cached(conn: sqlite3.Connection, namespace: str, blob_keys: Iterable[str]) -> Dict[str, Any]:
+    """Returns the cached results for the given keys and marks them as recently used."""
+    blob_keys = list(blob_keys)
+    found: Dict[str, Any] = {}
+
+    for start in range(0, len(blob_keys), _BATCH_SIZE):
+        batch = blob_keys[start:start + _BATCH_SIZE]
+        placeholders = ','.join('?' * len(batch))
+        rows = conn.execute(
+            f'SELECT blob_key, result FROM results WHERE namespace = ? AND blob_key IN ({placeholders})',
+            (namespace, *batch)
+        ).fetchall()
+        for blob_key, result in rows:
+            found[blob_key] = json.loads(result)
+        if rows:
+            conn.executemany(
+                'UPDATE results SET last_used = ? WHERE namespace = ? AND blob_key = ?',
+                [(stamp, namespace, blob_key) for stamp, (blob_key, _) in zip(_next_use_stamps(conn, len(rows)), rows)]
+            )
+
+    return found
+
+
+def put_cached(conn: sqlite3.Connection, namespace: str, items: Iterable[Tuple[str, Any]]):
+    """Stores results by blob key, then trims the cache back under its size cap."""
+    items = [(blob_key, json.dumps(result)) for blob_key, result in items]
+    if not items:
+        return
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        rows: List[Tuple[str, str, str, int]] = [
+            (namespace, blob_key, result, stamp)
+            for stamp, (blob_key, result) in zip(_next_use_stamps(conn, len(items)), items)
+        ]
+        conn.executemany(
+            'INSERT OR REPLACE INTO results (namespace, blob_key, result, last_used) VALUES (?, ?, ?, ?)',
+            rows
+        )
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+    evict_blob_cache(conn)
+
+
+def evict_blob_cache(conn: sqlite3.Connection):
+    """Deletes least-recently-used results until the stored payload fits BLOB_CACHE_MAX_BYTES."""
+    total = conn.execute('SELECT COALESCE(SUM(LENGTH(result) + LENGTH(blob_key)), 0) FROM results').fetchone()[0]
+    if total <= BLOB_CACHE_MAX_BYTES:
+        return
+
+    # Free a little more than needed so we don't evict on every single write
+    to_free = total - int(BLOB_CACHE_MAX_BYTES * 0.9)
+    freed = 0
+    victims: List[int] = []
+    cursor = conn.execute(
+        'SELECT rowid, LENGTH(result) + LENGTH(blob_key) FROM results ORDER BY last_used, rowid'
+    )
+    for rowid, size in cursor:
+        victims.append(rowid)
+        freed += size
+        if freed >= to_free:
+            break
+    cursor.close()
+
+    # Delete exactly the chosen rows; rows sharing a timestamp with the last victim are kept
+    for start in range(0, len(victims), _BATCH_SIZE):
+        batch = victims[start:start + _BATCH_SIZE]
+        conn.execute(f'DELETE FROM results WHERE rowid IN ({",".join("?" * len(batch))})', batch)
@@ -1,60 +1,230 @@
 import os
 import re
-from typing import Dict, Any, Tuple
+import posixpath
+from collections import defaultdict
+from typing import Dict, Any, Tuple, List, Optional, Set
+
+from repo_source import open_source
+from file_table import iter_files
 
 # Common import/include patterns for various languages
+JS_IMPORT_PATTERN = r'(?:require\s*\(\s*|import\s*\(\s*|from\s+|import\s+)[\'"]([^\'"]+)[\'"]'
+
 DEPENDENCY_PATTERNS = {
     '.py': r'(?:from|import)\s+([\w\.]+)',
-    '.js': r'(?:require|import)\s+[\'"]?([.\/a-zA-Z0-9_-]+)[\'"]?',
-    '.ts': r'(?:import|export)\s+[\'"]?([.\/a-zA-Z0-9_-]+)[\'"]?',
-    '.java': r'import\s+([\w\.]+);',
+    '.js': JS_IMPORT_PATTERN,
+    '.ts': JS_IMPORT_PATTERN,
+    '.java': r'import\s+(?:static\s+)?([\w\.]+);',
     '.c': r'#include\s+["<]([\w\/\.]+)[">]',
     '.cpp': r'#include\s+["<]([\w\/\.]+)[">]',
     '.html': r'(?:<script\s+src|href)\s*=\s*["\']([^"\']+)["\']', # Basic HTML resource detection
 }
 
-def analyze_dependencies(repo_path: str, all_file_data: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
-    """Analyzes dependencies (Fan-in/Fan-out) between files."""
-    
-    # Initialize dependency graph
-    fan_out_map: Dict[str, List[str]] = {path: [] for path in all_file_data.keys()}
-    
-    # 1. Determine Fan-out (dependencies a file uses)
-    for path, data in all_file_data.items():
-        file_extension = os.path.splitext(path)[1]
-        pattern = DEPENDENCY_PATTERNS.get(file_extension)
-        
-        if not pattern:
-            continue
-
-        file_path_abs = os.path.join(repo_path, path)
-        try:
-            with open(file_path_abs, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-        except Exception:
-            continue
-            
-        found_dependencies = set(re.findall(pattern, content))
-
-        for dep in found_dependencies:
-            # Simple heuristic: look for paths that match
-            for target_path in all_file_data.keys():
-                if dep in target_path or os.path.basename(dep) in target_path:
-                    if target_path != path: # Don't count self-dependency
-                        fan_out_map[path].append(target_path)
-                        break
-        
-        # Store Fan-out count
-        data['fan_out'] = len(set(fan_out_map[path]))
+# Extensions and index files tried when resolving extension-less JS/TS imports
+JS_RESOLVE_EXTENSIONS = ('', '.js', '.ts', '.jsx', '.tsx', '.mjs', '.cjs')
+JS_INDEX_FILES = tuple(f'/index{ext}' for ext in JS_RESOLVE_EXTENSIONS if ext)
+
+
+def python_module_name(path: str, files: Set[str]) -> Optional[str]:
+    """
+    Dotted module name of a .py file, relative to the root it would be imported from:
+    the directory above its chain of `__init__.py` packages, else `src/` for files in
+    it, else the repository's top level. None for a top-level `__init__.py`.
+    """
+    directories = path.split('/')[:-1]
+    top = len(directories)
+    while top > 0 and '/'.join(directories[:top]) + '/__init__.py' in files:
+        top -= 1
+
+    if top < len(directories):
+        root_length = top
+    elif directories and directories[0] == 'src':
+        root_length = 1
+    else:
+        root_length = 0
+
+    parts = posixpath.splitext(path)[0].split('/')[root_length:]
+    if parts and parts[-1] == '__init__':
+        parts = parts[:-1]
+    return '.'.join(parts) or None
+
+
+def build_module_index(paths: List[str]) -> Dict[str, Any]:
+    """
+    Builds the lookup tables used to resolve imports in O(1).
+
+    - 'files': every analyzed POSIX path
+    - 'python': dotted module name (see python_module_name) -> candidate paths
+    - 'python_top_level': first components of those names, i.e. the repo's own
+      top-level packages and modules
+    - 'java': dotted class name (and each trailing suffix of it, for src/main/java
+      layouts) -> candidate paths
+    - 'basenames': file name -> candidate paths, for C/C++ includes
+    """
+    files = set(paths)
+    index: Dict[str, Any] = {
+        'files': files,
+        'python': defaultdict(list),
+        'python_top_level': set(),
+        'java': defaultdict(list),
+        'basenames': defaultdict(list),
+    }
+
+    for path in paths:
+        index['basenames'][posixpath.basename(path)].append(path)
+
+        stem, ext = posixpath.splitext(path)
+        if ext == '.py':
+            module_name = python_module_name(path, files)
+            if module_name:
+                index['python'][module_name].append(path)
+                index['python_top_level'].add(module_name.split('.', 1)[0])
+        elif ext == '.java':
+            parts = stem.split('/')
+            for start in range(len(parts)):
+                index['java']['.'.join(parts[start:])].append(path)
+
+    return index
+
+
+def _closest(candidates: List[str], importer: str) -> Optional[str]:
+    """Picks the candidate sharing the longest directory prefix with the importer."""
+    if not candidates:
+        return None
+    if len(candidates) == 1:
+        return candidates[0]
+    importer_dir = posixpath.dirname(importer)
+    return max(candidates, key=lambda c: (len(posixpath.commonpath([importer_dir, posixpath.dirname(c)])), -len(c)))
+
+
+def _resolve_python(dep: str, importer: str, index: Dict[str, Any]) -> Optional[str]:
+    files = index['files']
+
+    # Relative import: ".mod" / "..pkg.mod" / "." (trailing names may be objects: ".mod.func" -> ".mod" -> ".")
+    if dep.startswith('.'):
+        level = len(dep) - len(dep.lstrip('.'))
+        base = posixpath.dirname(importer)
+        for _ in range(level - 1):
+            base = posixpath.dirname(base)
+        parts = [part for part in dep[level:].split('.') if part]
+        for end in range(len(parts), -1, -1):
+            target = posixpath.join(base, *parts[:end]) if end else base
+            for candidate in (f'{target}.py', f'{target}/__init__.py'):
+                candidate = candidate.lstrip('/')
+                if candidate in files:
+                    return candidate
+        return None
+
+    # Absolute import of one of the repo's own packages (anything else is stdlib or third party):
+    # try the full dotted name, then its parent packages ("a.b.c" -> "a.b" -> "a")
+    parts = dep.split('.')
+    if parts[0] not in index['python_top_level']:
+        return None
+    for end in range(len(parts), 0, -1):
+        target = _closest(index['python'].get('.'.join(parts[:end]), []), importer)
+        if target:
+            return target
+    return None
+
+
+def _resolve_js(dep: str, importer: str, index: Dict[str, Any]) -> Optional[str]:
+    # Bare specifiers ("react", "lodash/fp") are external packages
+    if dep not in ('.', '..') and not dep.startswith(('./', '../', '/')):
+        return None
+    base = '' if dep.startswith('/') else posixpath.dirname(importer)
+    target = posixpath.normpath(posixpath.join(base, dep.lstrip('/')))
+    for suffix in JS_RESOLVE_EXTENSIONS + JS_INDEX_FILES:
+        if target + suffix in index['files']:
+            return target + suffix
+    return None
+
+
+def _resolve_include(dep: str, importer: str, index: Dict[str, Any]) -> Optional[str]:
+    # Quoted includes are looked up next to the including file first
+    local = posixpath.normpath(posixpath.join(posixpath.dirname(importer), dep))
+    if local in index['files']:
+        return local
+    candidates = [c for c in index['basenames'].get(posixpath.basename(dep), []) if c.endswith(dep)]
+    return _closest(candidates, importer)
+
+
+def _resolve_html(dep: str, importer: str, index: Dict[str, Any]) -> Optional[str]:
+    dep = dep.split('?', 1)[0].split('#', 1)[0]
+    if not dep or '://' in dep or dep.startswith(('//', 'data:', 'mailto:')):
+        return None
+    base = '' if dep.startswith('/') else posixpath.dirname(importer)
+    target = posixpath.normpath(posixpath.join(base, dep.lstrip('/')))
+    return target if target in index['files'] else None
+
+
+def resolve_dependency(dep: str, importer: str, file_extension: str, index: Dict[str, Any]) -> Optional[str]:
+    """Resolves one import/include found in `importer` to an analyzed file, or None if external."""
+    if file_extension == '.py':
+        return _resolve_python(dep, importer, index)
+    if file_extension in ('.js', '.ts'):
+        return _resolve_js(dep, importer, index)
+    if file_extension == '.java':
+        return _closest(index['java'].get(dep, []), importer)
+    if file_extension in ('.c', '.cpp'):
+        return _resolve_include(dep, importer, index)
+    if file_extension == '.html':
+        return _resolve_html(dep, importer, index)
+    return None
+
+
+def analyze_dependencies(repo_path: str, all_file_data: Dict[str, Dict[str, Any]], source=None) -> Dict[str, Dict[str, Any]]:
+    """Analyzes dependencies (Fan-in/Fan-out) between files, reading them through `source` (see repo_source)."""
+    owns_source = source is None
+    if owns_source:
+        source = open_source(repo_path)
+
+    try:
+        # Git-style POSIX paths are used for resolution; map them back onto the data keys
+        posix_to_key = {path.replace(os.sep, '/'): path for path, _ in iter_files(all_file_data)}
+        index = build_module_index(list(posix_to_key))
+
+        # Initialize dependency graph
+        fan_out_map: Dict[str, set] = {path: set() for path in posix_to_key}
+
+        # 1. Determine Fan-out (dependencies a file uses)
+        for importer, path in posix_to_key.items():
+            data = all_file_data[path]
+            file_extension = os.path.splitext(path)[1]
+            pattern = DEPENDENCY_PATTERNS.get(file_extension)
+
+            if not pattern:
+                data['fan_out'] = 0
+                continue
+
+            if 'imports' in data:
+                # Python files: import targets were already collected by the static analysis AST pass
+                found_dependencies = set(data['imports'])
+            else:
+                content = source.read_text(importer)
+                if content is None:
+                    data['fan_out'] = 0
+                    continue
+                found_dependencies = set(re.findall(pattern, content))
+
+            for dep in found_dependencies:
+                target = resolve_dependency(dep, importer, file_extension, index)
+                if target and target != importer: # Don't count self-dependency
+                    fan_out_map[importer].add(target)
+
+            # Store Fan-out count
+            data['fan_out'] = len(fan_out_map[importer])
+    finally:
+        if owns_source:
+            source.close()
 
     # 2. Determine Fan-in (dependencies that use the file)
-    fan_in_map: Dict[str, int] = {path: 0 for path in all_file_data.keys()}
-    for dependents, targets in fan_out_map.items():
-        for target in set(targets):
-            fan_in_map[target] = fan_in_map.get(target, 0) + 1
-            
+    fan_in_map: Dict[str, int] = {path: 0 for path in posix_to_key}
+    for targets in fan_out_map.values():
+        for target in targets:
+            fan_in_map[target] += 1
+
     # Update data with Fan-in counts
-    for path, data in all_file_data.items():
-        data['fan_in'] = fan_in_map.get(path, 0)
-        
-    return all_file_data
\ No newline at end of file
+    for importer, path in posix_to_key.items():
+        all_file_data[path]['fan_in'] = fan_in_map[importer]
+
+    return all_file_data
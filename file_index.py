@@ -0,0 +1,99 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+
+from blob_cache import list_blob_ids
+from repo_source import open_source
+
+# File contents (raw bytes) kept in memory per analysis; least recently used files are dropped first
+FILE_INDEX_MEMORY_BUDGET = int(os.environ.get('GITDEBT_FILE_INDEX_MB', '512')) * 1024 * 1024
+
+
+class IndexedFile(NamedTuple):
+    path: str                # POSIX path relative to the repository root
+    size: int                # Size in bytes
+    blob_id: Optional[str]   # Git blob id, when the file is tracked
+    extension: str           # Lower-cased extension including the dot ('' if none)
+
+
+class FileIndex:
+    """
+    One listing of the repository's files, shared by every analysis stage.
+
+    Wraps a repo_source backend (working tree or object database) and exposes the
+    same entries()/read_text()/read_bytes() interface, so it can be passed as `source`
+    to each scanner. File contents are loaded lazily and memoized as bytes within
+    `memory_budget` bytes (text is decoded from them), so a file is read from disk
+    (or git) once per run unless the budget forces it out. Stages that read files
+    themselves, e.g. in worker processes, hand the contents over with remember().
+    """
+
+    def __init__(self, source, memory_budget: int = FILE_INDEX_MEMORY_BUDGET):
+        self.source = source
+        self.root = source.root
+        self.memory_budget = memory_budget
+
+        entries = source.entries()
+        blob_ids: Dict[str, str] = {}
+        if source.root is not None and not any(entry.blob_id for entry in entries):
+            blob_ids = list_blob_ids(source.root)
+
+        self._files: Dict[str, IndexedFile] = {
+            entry.path: IndexedFile(
+                entry.path,
+                entry.size,
+                entry.blob_id or blob_ids.get(entry.path),
+                os.path.splitext(entry.path)[1].lower()
+            )
+            for entry in entries
+        }
+        self._contents: "OrderedDict[str, bytes]" = OrderedDict()
+        self._content_bytes = 0
+        self._lock = threading.Lock()
+
+    def entries(self) -> List[IndexedFile]:
+        return list(self._files.values())
+
+    def get(self, path: str) -> Optional[IndexedFile]:
+        return self._files.get(path)
+
+    def read_bytes(self, path: str) -> Optional[bytes]:
+        with self._lock:
+            content = self._contents.get(path)
+            if content is not None:
+                self._contents.move_to_end(path)
+                return content
+
+        content = self.source.read_bytes(path)
+        if content is not None:
+            self.remember(path, content)
+        return content
+
+    def read_text(self, path: str) -> Optional[str]:
+        content = self.read_bytes(path)
+        return content.decode('utf-8', errors='ignore') if content is not None else None
+
+    def remember(self, path: str, content: bytes):
+        """Memoizes contents that were read without going through the index."""
+        if len(content) > self.memory_budget:
+            return
+
+        with self._lock:
+            if path not in self._contents:
+                self._contents[path] = content
+                self._content_bytes += len(content)
+                while self._content_bytes > self.memory_budget:
+                    _, evicted = self._contents.popitem(last=False)
+                    self._content_bytes -= len(evicted)
+
+    def close(self):
+        with self._lock:
+            self._contents.clear()
+            self._content_bytes = 0
+        self.source.close()
+
+
+def build_file_index(repo_path: str, memory_budget: int = FILE_INDEX_MEMORY_BUDGET) -> FileIndex:
+    """Lists repo_path's files once (working tree, or object database for bare repos)."""
+    return FileIndex(open_source(repo_path), memory_budget)
@@ -0,0 +1,475 @@
+import sys
+from collections.abc import Mapping, MutableMapping
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Rows allocated up front; the table doubles its capacity whenever it fills up
+INITIAL_CAPACITY = 1024
+
+_INT32_MIN, _INT32_MAX = -2 ** 31, 2 ** 31 - 1
+_MISSING = object()  # Marks an object-column cell that was never set
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_))
+
+
+def _grow(array: np.ndarray, capacity: int) -> np.ndarray:
+    grown = np.zeros(capacity, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+# Item layouts of the list-valued columns (see _RaggedColumn)
+AUTHOR_DTYPE = np.dtype([('author', np.int32), ('commits', np.int32)])
+IMPORT_DTYPE = np.dtype([('name', np.int32)])
+# Symbol names are slices of FileTable._symbol_names (UTF-8); kinds index FileTable.symbol_kinds
+SYMBOL_DTYPE = np.dtype([
+    ('kind', np.int8), ('name_start', np.int64), ('name_length', np.int32),
+    ('start_line', np.int32), ('end_line', np.int32), ('complexity', np.int32), ('loc', np.int32),
+])
+
+
+class _RaggedColumn:
+    """
+    A list-valued column stored CSR-style: row r's items are values[start[r]:start[r] + length[r]].
+
+    Items go to one append-only structured array; a row that is set again just points at
+    its new segment.
+    """
+
+    def __init__(self, dtype: np.dtype):
+        self.start = np.zeros(0, dtype=np.int64)
+        self.length = np.zeros(0, dtype=np.int32)
+        self.present = np.zeros(0, dtype=bool)
+        self.values = np.zeros(INITIAL_CAPACITY, dtype=dtype)
+        self.fill = 0
+
+    def reserve(self, capacity: int):
+        self.start = _grow(self.start, capacity)
+        self.length = _grow(self.length, capacity)
+        self.present = _grow(self.present, capacity)
+
+    def keep_rows(self, keep: np.ndarray, capacity: int):
+        """Drops the rows where `keep` is False (their items stay in `values`, unreferenced)."""
+        self.start = _grow(self.start[:len(keep)][keep], capacity)
+        self.length = _grow(self.length[:len(keep)][keep], capacity)
+        self.present = _grow(self.present[:len(keep)][keep], capacity)
+
+    def set(self, row: int, items: np.ndarray):
+        needed = self.fill + len(items)
+        if needed > len(self.values):
+            self.values = _grow(self.values, max(needed, len(self.values) * 2))
+        self.values[self.fill:needed] = items
+        self.start[row] = self.fill
+        self.length[row] = len(items)
+        self.present[row] = True
+        self.fill = needed
+
+    def get(self, row: int) -> np.ndarray:
+        start = self.start[row]
+        return self.values[start:start + self.length[row]]
+
+    def csr(self, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(indptr, items) for the first `count` rows, rows that were never set being empty."""
+        lengths = np.where(self.present[:count], self.length[:count], 0).astype(np.int64)
+        indptr = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        # Position of each CSR slot in the append-only values array
+        positions = np.repeat(self.start[:count] - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return indptr, self.values[positions]
+
+    def arrays(self) -> List[np.ndarray]:
+        return [self.start, self.length, self.present, self.values]
+
+
+class FileRow(MutableMapping):
+    """
+    Dict-like view of one file in a FileTable.
+
+    Reads and writes go straight to the table's columns, so code written against the
+    old per-file dicts (data['loc'], data.get('risk_score'), 'imports' in data,
+    data.update(...)) keeps working. dict(row) makes a detached copy.
+    """
+
+    __slots__ = ('_table', '_path')
+
+    def __init__(self, table: 'FileTable', path: str):
+        self._table = table
+        self._path = path
+
+    def __getitem__(self, key: str) -> Any:
+        return self._table._get(self._table._rows[self._path], key)
+
+    def __setitem__(self, key: str, value: Any):
+        self._table._set(self._table._rows[self._path], key, value)
+
+    def __delitem__(self, key: str):
+        self._table._unset(self._table._rows[self._path], key)
+
+    def __contains__(self, key: object) -> bool:
+        return self._table._has(self._table._rows[self._path], key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table._row_keys(self._table._rows[self._path]))
+
+    def __len__(self) -> int:
+        return len(self._table._row_keys(self._table._rows[self._path]))
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class FileTable(MutableMapping):
+    """
+    Array-backed store for the per-file analysis results (the pipeline's all_file_data).
+
+    - paths are interned and mapped to row numbers
+    - numeric metrics live in one NumPy column each (int32 until a value needs more,
+      float64 for floats) with a presence mask, so 'key in data' still means "was set"
+    - author_commits, imports and symbols are CSR-style columns (see _RaggedColumn) over
+      interned author emails, interned import names and a shared UTF-8 buffer of symbol
+      names, i.e. a few bytes per entry instead of a Python list per file
+    - anything else (main_factor, ...) goes to per-column Python lists
+
+    Entries whose key starts with '_' (_repo_stats, _contributor_stats, ...) are kept in
+    `meta` rather than as rows. The table itself behaves like the old dict: items()
+    yields FileRow views for files followed by the meta entries. New code should use
+    files() / column() / set_column() instead and never see the meta entries.
+    """
+
+    def __init__(self):
+        self.paths: List[str] = []
+        self.meta: Dict[str, Any] = {}
+        self._rows: Dict[str, int] = {}
+        self._capacity = 0
+        self._numeric: Dict[str, np.ndarray] = {}
+        self._present: Dict[str, np.ndarray] = {}
+        self._objects: Dict[str, List[Any]] = {}
+
+        # List-valued columns and the string tables their items point into
+        self._ragged: Dict[str, _RaggedColumn] = {
+            'author_commits': _RaggedColumn(AUTHOR_DTYPE),
+            'imports': _RaggedColumn(IMPORT_DTYPE),
+            'symbols': _RaggedColumn(SYMBOL_DTYPE),
+        }
+        self.authors: List[str] = []
+        self._author_ids: Dict[str, int] = {}
+        self.import_names: List[str] = []
+        self._import_ids: Dict[str, int] = {}
+        self.symbol_kinds: List[str] = []
+        self._symbol_kind_ids: Dict[str, int] = {}
+        self._symbol_names = bytearray()
+
+    # --- Table-level API ---
+
+    def add_file(self, path: str, metrics: Optional[Mapping] = None) -> int:
+        """Adds (or replaces) a file's row and returns its row number."""
+        row = self._rows.get(path)
+        if row is None:
+            row = self._new_row(path)
+        else:
+            self._clear_row(row)
+        for key, value in (metrics or {}).items():
+            self._set(row, key, value)
+        return row
+
+    def update_files(self, items: Iterable[Tuple[str, Mapping]]):
+        """
+        Bulk form of table[path].update(metrics) (adding missing files): one vector
+        write per numeric metric instead of one Python-level write per cell.
+        """
+        rows: List[int] = []
+        records: List[Mapping] = []
+        for path, metrics in items:
+            row = self._rows.get(path)
+            rows.append(self._new_row(path) if row is None else row)
+            records.append(metrics)
+
+        for key in dict.fromkeys(key for record in records for key in record):
+            cells = [(row, record[key]) for row, record in zip(rows, records) if key in record]
+            if key not in self._ragged and key not in self._objects and _is_number(cells[0][1]):
+                # NumPy infers an integer/float dtype only if every value is a number (bools excluded)
+                try:
+                    values = np.array([value for _, value in cells])
+                except (ValueError, TypeError):
+                    values = None
+                if values is not None and values.ndim == 1 and values.dtype.kind in 'iuf':
+                    self.set_column(key, values, np.array([row for row, _ in cells], dtype=np.int64))
+                    continue
+            for row, value in cells:
+                self._set(row, key, value)
+
+    def files(self) -> Iterator[Tuple[str, FileRow]]:
+        """Yields (path, row view) for every file, without the meta entries."""
+        for path in self.paths:
+            yield path, FileRow(self, path)
+
+    def row_of(self, path: str) -> int:
+        return self._rows[path]
+
+    def has_column(self, name: str) -> bool:
+        return name in self._numeric
+
+    def column(self, name: str, default: float = 0) -> np.ndarray:
+        """A metric for every row as float64, with `default` where it was never set."""
+        count = len(self.paths)
+        values = self._numeric.get(name)
+        if values is None:
+            return np.full(count, default, dtype=np.float64)
+        return np.where(self._present[name][:count], values[:count], default).astype(np.float64)
+
+    def set_column(self, name: str, values: np.ndarray, rows: Optional[np.ndarray] = None):
+        """Writes a metric for all rows (or the given row numbers) in one vector operation."""
+        values = np.asarray(values)
+        fits_int32 = values.dtype.kind in 'iu' and (
+            values.size == 0 or (values.min() >= _INT32_MIN and values.max() <= _INT32_MAX)
+        )
+        if name not in self._numeric:
+            dtype = np.float64 if values.dtype.kind == 'f' else np.int32 if fits_int32 else np.int64
+            self._numeric[name] = np.zeros(self._capacity, dtype=dtype)
+            self._present[name] = np.zeros(self._capacity, dtype=bool)
+        elif values.dtype.kind == 'f' and self._numeric[name].dtype.kind != 'f':
+            self._numeric[name] = self._numeric[name].astype(np.float64)
+        elif not fits_int32 and self._numeric[name].dtype == np.int32:
+            self._numeric[name] = self._numeric[name].astype(np.int64)
+
+        target = slice(0, len(self.paths)) if rows is None else rows
+        self._numeric[name][target] = values
+        self._present[name][target] = True
+
+    def author_matrix(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        author_commits of every row as a CSR matrix: (indptr, author indices, commit counts).
+
+        Row r's authors are `self.authors[i]` for i in indices[indptr[r]:indptr[r + 1]].
+        """
+        indptr, items = self._ragged['author_commits'].csr(len(self.paths))
+        return indptr, items['author'], items['commits']
+
+    def memory_usage(self) -> int:
+        """Bytes held by the table's arrays and symbol name buffer (object columns and interned strings not included)."""
+        arrays = [*self._numeric.values(), *self._present.values(),
+                  *(array for column in self._ragged.values() for array in column.arrays())]
+        return sum(array.nbytes for array in arrays) + len(self._symbol_names)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain nested dicts, in the old all_file_data shape (for JSON responses)."""
+        count = len(self.paths)
+        numeric = [(name, values[:count].tolist(), self._present[name][:count].tolist())
+                   for name, values in self._numeric.items()]
+        ragged = [(name, column.present[:count].tolist()) for name, column in self._ragged.items()]
+
+        result: Dict[str, Any] = {}
+        for row, path in enumerate(self.paths):
+            record = {name: values[row] for name, values, present in numeric if present[row]}
+            for name, objects in self._objects.items():
+                if objects[row] is not _MISSING:
+                    record[name] = objects[row]
+            for name, present in ragged:
+                if present[row]:
+                    record[name] = self._decode(name, self._ragged[name].get(row))
+            result[path] = record
+        result.update(self.meta)
+        return result
+
+    # --- Mapping interface (compatibility with the old Dict[str, Dict[str, Any]]) ---
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._rows:
+            return FileRow(self, key)
+        return self.meta[key]
+
+    def __setitem__(self, key: str, value: Any):
+        if key.startswith('_'):
+            self.meta[key] = value
+        else:
+            self.add_file(key, value)
+
+    def __delitem__(self, key: str):
+        if key in self.meta:
+            del self.meta[key]
+            return
+        row = self._rows.pop(key)
+        keep = np.arange(len(self.paths)) != row
+        del self.paths[row]
+        for name in self._numeric:
+            self._numeric[name] = _grow(self._numeric[name][:len(keep)][keep], self._capacity)
+            self._present[name] = _grow(self._present[name][:len(keep)][keep], self._capacity)
+        for objects in self._objects.values():
+            del objects[row]
+            objects.append(_MISSING)
+        for column in self._ragged.values():
+            column.keep_rows(keep, self._capacity)
+        for index, path in enumerate(self.paths[row:], start=row):
+            self._rows[path] = index
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._rows or key in self.meta
+
+    def __iter__(self) -> Iterator[str]:
+        yield from list(self.paths)
+        yield from list(self.meta)
+
+    def __len__(self) -> int:
+        return len(self.paths) + len(self.meta)
+
+    # --- Cell access ---
+
+    def _new_row(self, path: str) -> int:
+        row = len(self.paths)
+        if row == self._capacity:
+            self._reserve(max(INITIAL_CAPACITY, self._capacity * 2))
+        path = sys.intern(path)
+        self.paths.append(path)
+        self._rows[path] = row
+        return row
+
+    def _reserve(self, capacity: int):
+        for name in self._numeric:
+            self._numeric[name] = _grow(self._numeric[name], capacity)
+            self._present[name] = _grow(self._present[name], capacity)
+        for objects in self._objects.values():
+            objects.extend([_MISSING] * (capacity - self._capacity))
+        for column in self._ragged.values():
+            column.reserve(capacity)
+        self._capacity = capacity
+
+    def _clear_row(self, row: int):
+        for present in self._present.values():
+            present[row] = False
+        for objects in self._objects.values():
+            objects[row] = _MISSING
+        for column in self._ragged.values():
+            column.present[row] = False
+
+    def _get(self, row: int, key: str) -> Any:
+        values = self._numeric.get(key)
+        if values is not None:
+            if self._present[key][row]:
+                return values[row].item()
+            raise KeyError(key)
+        column = self._ragged.get(key)
+        if column is not None and column.present[row]:
+            return self._decode(key, column.get(row))
+        objects = self._objects.get(key)
+        if objects is None or objects[row] is _MISSING:
+            raise KeyError(key)
+        return objects[row]
+
+    def _has(self, row: int, key: object) -> bool:
+        if key in self._present:
+            return bool(self._present[key][row])
+        column = self._ragged.get(key)
+        if column is not None and column.present[row]:
+            return True
+        objects = self._objects.get(key)
+        return objects is not None and objects[row] is not _MISSING
+
+    def _row_keys(self, row: int) -> List[str]:
+        keys = [name for name, present in self._present.items() if present[row]]
+        keys.extend(name for name, objects in self._objects.items() if objects[row] is not _MISSING)
+        keys.extend(name for name, column in self._ragged.items() if column.present[row])
+        return keys
+
+    def _set(self, row: int, key: str, value: Any):
+        items = self._encode(key, value) if key in self._ragged else None
+        if items is not None:
+            if key in self._objects:
+                self._objects[key][row] = _MISSING
+            self._ragged[key].set(row, items)
+            return
+
+        values = self._numeric.get(key)
+        if _is_number(value) and key not in self._objects:
+            if values is None:
+                dtype = np.float64 if isinstance(value, (float, np.floating)) else np.int32
+                values = self._numeric[key] = np.zeros(self._capacity, dtype=dtype)
+                self._present[key] = np.zeros(self._capacity, dtype=bool)
+            if isinstance(value, (float, np.floating)) and values.dtype.kind != 'f':
+                values = self._numeric[key] = values.astype(np.float64)
+            elif values.dtype == np.int32 and not _INT32_MIN <= value <= _INT32_MAX:
+                values = self._numeric[key] = values.astype(np.int64)
+            values[row] = value
+            self._present[key][row] = True
+            return
+
+        if values is not None:
+            # A non-numeric value for a numeric metric: keep the column as plain objects from now on
+            present = self._present.pop(key)
+            self._objects[key] = [
+                number if is_set else _MISSING for number, is_set in zip(values.tolist(), present.tolist())
+            ]
+            del self._numeric[key]
+        objects = self._objects.get(key)
+        if objects is None:
+            objects = self._objects[key] = [_MISSING] * self._capacity
+        objects[row] = value
+        if key in self._ragged:
+            self._ragged[key].present[row] = False
+
+    def _unset(self, row: int, key: str):
+        if not self._has(row, key):
+            raise KeyError(key)
+        if key in self._present:
+            self._present[key][row] = False
+        elif key in self._ragged and self._ragged[key].present[row]:
+            self._ragged[key].present[row] = False
+        else:
+            self._objects[key][row] = _MISSING
+
+    def _intern(self, value: str, names: List[str], ids: Dict[str, int]) -> int:
+        index = ids.get(value)
+        if index is None:
+            index = ids[value] = len(names)
+            names.append(sys.intern(value))
+        return index
+
+    def _encode(self, key: str, value: Any) -> Optional[np.ndarray]:
+        """Items of a list-valued column, or None if `value` doesn't have the column's shape."""
+        try:
+            if key == 'author_commits' and isinstance(value, Mapping):
+                return np.array([
+                    (self._intern(author_email, self.authors, self._author_ids), commits)
+                    for author_email, commits in value.items()
+                ], dtype=AUTHOR_DTYPE)
+            if key == 'imports' and isinstance(value, (list, tuple)) and all(isinstance(v, str) for v in value):
+                return np.array([(self._intern(name, self.import_names, self._import_ids),) for name in value],
+                                dtype=IMPORT_DTYPE)
+            if key == 'symbols' and isinstance(value, (list, tuple)):
+                items, names, name_start = [], bytearray(), len(self._symbol_names)
+                for kind, name, start_line, end_line, complexity, loc in value:
+                    encoded = str(name).encode('utf-8')
+                    items.append((
+                        self._intern(kind, self.symbol_kinds, self._symbol_kind_ids),
+                        name_start + len(names), len(encoded), start_line, end_line, complexity, loc
+                    ))
+                    names += encoded
+                items = np.array(items, dtype=SYMBOL_DTYPE)
+                self._symbol_names += names
+                return items
+        except (TypeError, ValueError, OverflowError):
+            pass
+        return None
+
+    def _decode(self, key: str, items: np.ndarray) -> Any:
+        if key == 'author_commits':
+            return {self.authors[author]: commits for author, commits in items.tolist()}
+        if key == 'imports':
+            return [self.import_names[name] for name in items['name'].tolist()]
+        names = self._symbol_names
+        return [
+            [self.symbol_kinds[kind], names[name_start:name_start + name_length].decode('utf-8'),
+             start_line, end_line, complexity, loc]
+            for kind, name_start, name_length, start_line, end_line, complexity, loc in items.tolist()
+        ]
+
+def iter_files(all_file_data: Mapping) -> Iterator[Tuple[str, Mapping]]:
+    """(path, metrics) for every file of a FileTable or an old-style dict, skipping '_' entries."""
+    if isinstance(all_file_data, FileTable):
+        return all_file_data.files()
+    return (
+        (path, data) for path, data in all_file_data.items()
+        if not path.startswith('_') and isinstance(data, dict)
+    )
@@ -4,16 +4,24 @@ import shutil
 import tempfile
 import sys
 import stat
-from typing import Dict, Any
+import subprocess
+from contextlib import ExitStack
+from typing import Dict, Any, Callable, Optional
 
 # Assume these modules are present in your directory
-from repo_cloner import clone_repository
+from repo_cloner import clone_repository, locked_mirror, CLONE_STRATEGIES, DEFAULT_CLONE_STRATEGY
 from static_analyzer import run_static_analysis
 from git_history_analyzer import analyze_git_history
 from dependency_analyzer import analyze_dependencies
 from metrics_calculator import compute_advanced_metrics
 from report_generator import find_main_contributing_factor, generate_cli_report 
 from contributor_analyzer import analyze_contributor_efficiency
+from file_index import FileIndex, build_file_index
+from file_table import FileTable, iter_files
+from hotspot_index import build_hotspot_index
+
+# Bump whenever the pipeline's output changes so cached API results are invalidated
+PIPELINE_VERSION = '5'
 
 
 # Simplified onerror handler for cross-platform cleanup resilience
@@ -30,55 +38,126 @@ def onerror(func, path, exc_info):
     else:
         raise
 
-def run_analysis_pipeline(repo_url: str) -> Dict[str, Any]:
-    """Runs the full analysis pipeline and returns the complete data dictionary."""
-    
+def remove_checkout(temp_dir: str):
+    """Deletes a temporary checkout, tolerating read-only git object files."""
+    if temp_dir and os.path.exists(temp_dir):
+        print(f"\n🧹 Cleaning up temporary directory: {temp_dir}")
+        try:
+            # Use simplified onerror handler
+            shutil.rmtree(temp_dir, onerror=onerror)
+            print("✅ Cleanup complete.")
+        except Exception as e:
+            # Print a simpler warning if cleanup fails
+            print(f"⚠️ Warning: Could not fully delete temporary directory: {temp_dir}. Error: {e}", file=sys.stderr)
+
+def resolve_head(repo_path: str) -> Optional[str]:
+    """SHA of the commit checked out (or HEAD of a bare mirror) at repo_path, or None."""
+    result = subprocess.run(
+        ['git', '-C', repo_path, 'rev-parse', '--verify', 'HEAD'],
+        capture_output=True, text=True, check=False
+    )
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def run_analysis_pipeline(repo_url: str, repo_path: str | None = None,
+                          progress_callback: Optional[Callable[[str], None]] = None,
+                          clone_strategy: str = DEFAULT_CLONE_STRATEGY,
+                          history_depth: Optional[int] = None,
+                          history_since: Optional[str] = None,
+                          checkout_free: bool = False,
+                          file_index: Optional[FileIndex] = None,
+                          history_shards: Optional[int] = None,
+                          recency_weight: Optional[float] = None) -> FileTable:
+    """
+    Runs the full analysis pipeline and returns the complete data as a FileTable
+    (dict-compatible; use .to_dict() for plain nested dicts).
+
+    If `repo_path` points at an existing checkout of `repo_url`, it is analyzed in place
+    and left on disk for the caller (e.g. to share it with the security analyzer).
+    Otherwise the repository is cloned into a temporary directory that is removed afterwards.
+    `progress_callback`, if given, is called with the name of each stage as it starts.
+    `clone_strategy`, `history_depth` and `history_since` select a partial, shallow or
+    sparse clone (see repo_cloner.CLONE_STRATEGIES); history metrics then cover only
+    the fetched commits. With `checkout_free`, the cached bare mirror is analyzed in
+    place: files are read from the git object database and nothing is written or deleted.
+    Every file-reading stage shares one FileIndex; pass `file_index` (built over
+    `repo_path`) to share it with stages that run after the pipeline, too.
+    `history_shards` splits the history pass across processes (see git_history_analyzer).
+    `recency_weight` (0-1) makes risk scores favour recent churn and bug fixes over lifetime totals.
+    The SHA of the commit actually analyzed is stored under '_head_sha'.
+    """
+
+    def report_stage(stage: str):
+        if progress_callback:
+            progress_callback(stage)
+
     temp_dir = None
-    all_file_data: Dict[str, Any] = {}
+    owns_file_index = file_index is None
+    mirror_context = ExitStack()
+    all_file_data = FileTable()
     original_recursion_limit = sys.getrecursionlimit()
     sys.setrecursionlimit(2000)
 
     try:
         # --- 1. Clone Repository ---
-        print(f"🔄 Cloning repository: {repo_url}...")
-        temp_dir = clone_repository(repo_url)
-        if not temp_dir:
-            raise Exception("Cloning failed. Git executable or repo URL is invalid.")
-        print("✅ Cloning complete.")
+        report_stage('cloning')
+        if repo_path:
+            print(f"📂 Using existing checkout: {repo_path}")
+            temp_dir = repo_path
+        elif checkout_free:
+            print(f"🔄 Updating cached mirror of: {repo_url}...")
+            temp_dir = mirror_context.enter_context(locked_mirror(repo_url))
+            print("✅ Mirror ready. Reading files from the object database (no checkout).")
+        else:
+            print(f"🔄 Cloning repository: {repo_url}...")
+            temp_dir = clone_repository(repo_url, clone_strategy, depth=history_depth, shallow_since=history_since)
+            if not temp_dir:
+                raise Exception("Cloning failed. Git executable or repo URL is invalid.")
+            print("✅ Cloning complete.")
         
         # --- 2. Static Analysis ---
+        report_stage('static_analysis')
+        if owns_file_index:
+            file_index = build_file_index(temp_dir)
         print("🔬 Running static code analysis...")
-        all_file_data = run_static_analysis(temp_dir)
+        all_file_data = run_static_analysis(temp_dir, source=file_index)
         
         # --- 3. Git History Analysis ---
+        report_stage('git_history')
         print("🕰️ Analyzing Git history...")
-        all_file_data = analyze_git_history(temp_dir, all_file_data)
+        all_file_data = analyze_git_history(temp_dir, all_file_data, repo_url=repo_url, shards=history_shards)
         
         # --- 4. Dependency Analysis ---
+        report_stage('dependencies')
         print("🔗 Analyzing file dependencies...")
-        all_file_data = analyze_dependencies(temp_dir, all_file_data)
+        all_file_data = analyze_dependencies(temp_dir, all_file_data, source=file_index)
 
         # --- 5. Compute Advanced Metrics (Risk Scores, Entropy) ---
+        report_stage('metrics')
         print("📊 Computing Risk Scores and Ownership Entropy...")
-        all_file_data = compute_advanced_metrics(all_file_data)
+        all_file_data = compute_advanced_metrics(all_file_data, recency_weight=recency_weight)
         
         # --- 6. Contributor Analysis ---
+        report_stage('contributors')
         print("👤 Analyzing contributor efficiency...")
         contributor_data = analyze_contributor_efficiency(all_file_data)
         all_file_data['_contributor_stats'] = contributor_data
         
         # --- 7. Prepare Data for Reporting ---
+        report_stage('reporting')
+        # Most complex functions/classes across the repo, ranked once for reports and the API
+        all_file_data['_hotspots'] = build_hotspot_index(all_file_data).top()
         # Store the temporary path for filesystem scans
-        all_file_data['_local_repo_path'] = temp_dir 
+        all_file_data['_local_repo_path'] = temp_dir
+        # The commit that was analyzed (the remote may have moved on since the request came in)
+        all_file_data['_head_sha'] = resolve_head(temp_dir) 
         
         repo_stats = all_file_data.get('_repo_stats', {})
         max_values = repo_stats.get('max_values', {})
         
-        # FIX: Added isinstance check to prevent crashing on string values (like _local_repo_path)
-        for path, data in list(all_file_data.items()):
-            if isinstance(data, dict) and path != '_repo_stats' and path != '_contributor_stats':
-                if data.get('loc', 0) > 0:
-                     data['main_factor'] = find_main_contributing_factor(data, max_values)
+        for path, data in iter_files(all_file_data):
+            if data.get('loc', 0) > 0:
+                data['main_factor'] = find_main_contributing_factor(data, max_values)
 
         return all_file_data
         
@@ -88,22 +167,28 @@ def run_analysis_pipeline(repo_url: str) -> Dict[str, Any]:
         
     finally:
         sys.setrecursionlimit(original_recursion_limit)
-        # --- 8. Cleanup ---
-        if temp_dir and os.path.exists(temp_dir):
-            print(f"\n🧹 Cleaning up temporary directory: {temp_dir}")
-            try:
-                # Use simplified onerror handler
-                shutil.rmtree(temp_dir, onerror=onerror)
-                print("✅ Cleanup complete.")
-            except Exception as e:
-                # Print a simpler warning if cleanup fails
-                print(f"⚠️ Warning: Could not fully delete temporary directory: {temp_dir}. Error: {e}", file=sys.stderr)
+        # --- 8. Cleanup (only for checkouts this pipeline created itself) ---
+        if owns_file_index and file_index is not None:
+            file_index.close()
+        mirror_context.close()
+        if not repo_path and not checkout_free:
+            remove_checkout(temp_dir)
 
 
 def main():
     """CLI Entry point: Runs analysis and generates the CLI report."""
     parser = argparse.ArgumentParser(description="Git Debt Analyzer: Clones a Git repository and performs analysis.")
     parser.add_argument('--repo-url', required=True, help='URL of the Git repository to analyze')
+    parser.add_argument('--clone-strategy', choices=CLONE_STRATEGIES, default=DEFAULT_CLONE_STRATEGY,
+                        help='How much of the repository to fetch (default: %(default)s)')
+    parser.add_argument('--depth', type=int, default=None, help='Only analyze the last N commits of history')
+    parser.add_argument('--shallow-since', default=None, help='Only analyze history after this date (e.g. 2024-01-01)')
+    parser.add_argument('--no-checkout', action='store_true',
+                        help='Analyze the cached bare mirror directly instead of a temporary checkout')
+    parser.add_argument('--history-shards', type=int, default=None,
+                        help='Read large histories with this many parallel git processes (default: $GITDEBT_HISTORY_SHARDS or 1)')
+    parser.add_argument('--recency-weight', type=float, default=None,
+                        help='Weight (0-1) of recent over lifetime churn/bug fixes in risk scores (default: $GITDEBT_RECENCY_WEIGHT or 0)')
     
     args = parser.parse_args()
     repo_url = args.repo_url
@@ -114,7 +199,15 @@ def main():
         print("-" * 50)
         
         # Run the pipeline to get the data
-        all_file_data = run_analysis_pipeline(repo_url)
+        all_file_data = run_analysis_pipeline(
+            repo_url,
+            clone_strategy=args.clone_strategy,
+            history_depth=args.depth,
+            history_since=args.shallow_since,
+            checkout_free=args.no_checkout,
+            history_shards=args.history_shards,
+            recency_weight=args.recency_weight
+        )
         
         # Generate the CLI report using the collected data
         generate_cli_report(repo_url, all_file_data)
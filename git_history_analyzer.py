@@ -1,75 +1,525 @@
 import git
+import math
+import multiprocessing
 import os
-from typing import Dict, Any, List
+import re
+import sqlite3
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterable, List, Iterator, Optional, Tuple
+
+from file_table import FileTable, iter_files
+from history_index import (
+    open_history_index, get_meta, set_meta, index_transaction,
+    clear_history_index, store_commits, iter_indexed_commits
+)
+
+# Parallel history: number of commit-range shards (1 = single pass) and the smallest shard worth a process
+HISTORY_SHARDS = int(os.environ.get('GITDEBT_HISTORY_SHARDS', '1'))
+HISTORY_SHARD_MIN_COMMITS = int(os.environ.get('GITDEBT_HISTORY_SHARD_MIN_COMMITS', '5000'))
+# Shard workers are spawned, not forked: the pipeline runs in API and Streamlit threads, and forking beside threads is unsafe
+POOL_CONTEXT = multiprocessing.get_context('spawn')
+
+# Recent-activity metrics: trailing windows (days before the newest commit) and the churn decay half-life
+CHURN_WINDOWS_DAYS = tuple(sorted(
+    int(days) for days in os.environ.get('GITDEBT_CHURN_WINDOWS', '30,90,365').split(',') if days.strip()
+))
+CHURN_HALF_LIFE_DAYS = float(os.environ.get('GITDEBT_CHURN_HALF_LIFE_DAYS', '90'))
+SECONDS_PER_DAY = 86400
+
+# Per-window field names: (churn, commits, bug fixes, authors)
+WINDOW_FIELDS = [
+    (days, f'churn_{days}d', f'commits_{days}d', f'bug_fixes_{days}d', f'authors_{days}d')
+    for days in CHURN_WINDOWS_DAYS
+]
+# Fields that are plain sums, and therefore merge across shards by addition
+SUMMED_FIELDS = (
+    'commit_count', 'lines_added', 'lines_removed', 'bug_fix_count',
+    'decayed_churn', 'decayed_commits', 'decayed_bug_fixes',
+    *(field for _, churn, commits, bug_fixes, _ in WINDOW_FIELDS for field in (churn, commits, bug_fixes))
+)
+
+# Define common bug keywords
+BUG_KEYWORDS = ['fix', 'bug', 'error', 'broken', 'issue', 'hotfix']
+
+# Control characters used to delimit commit headers in the `git log` stream.
+# They never appear in SHAs/emails and are vanishingly rare in commit messages.
+RECORD_START = '\x1e'
+FIELD_SEP = '\x1f'
+HEADER_END = '\x1d'
+LOG_FORMAT = '%x1e%H%x1f%ae%x1f%at%x1f%B%x1d'
+
+# Numstat path of a rename inside a common prefix/suffix: "src/{old => new}/file.py"
+BRACED_RENAME_PATTERN = re.compile(r'^(.*)\{(.*) => (.*)\}(.*)$')
+
+
+def is_bug_fix_message(message: str) -> bool:
+    """Returns True if a commit message looks like a bug fix."""
+    message = message.lower()
+    return any(keyword in message for keyword in BUG_KEYWORDS)
+
+
+def empty_history() -> Dict[str, Any]:
+    """
+    Returns the zeroed history metrics for a single file.
+
+    Besides lifetime totals there are churn/commit/bug-fix/author counts for each of
+    CHURN_WINDOWS_DAYS ('churn_90d', ...) and exponentially decayed churn, commit and
+    bug-fix totals, all relative to the newest commit. 'author_last_commit' is working
+    state for the windowed author counts and is dropped by finish_history.
+    """
+    history: Dict[str, Any] = {
+        'commit_count': 0, 'lines_added': 0, 'lines_removed': 0,
+        'unique_author_count': 0, 'bug_fix_count': 0, 'author_commits': {},
+        'decayed_churn': 0.0, 'decayed_commits': 0.0, 'decayed_bug_fixes': 0.0,
+        'author_last_commit': {}
+    }
+    for _, churn, commits, bug_fixes, authors in WINDOW_FIELDS:
+        history[churn] = history[commits] = history[bug_fixes] = history[authors] = 0
+    return history
+
+
+def parse_numstat_path(path: str) -> Tuple[Optional[str], str]:
+    """
+    Splits a numstat path into (old_path, new_path).
+
+    old_path is None unless rename detection reported a move, written either as
+    "old => new" or with the common parts factored out: "src/{old => new}/file.py".
+    """
+    if ' => ' not in path:
+        return None, path
+
+    match = BRACED_RENAME_PATTERN.match(path)
+    if match:
+        prefix, old, new, suffix = match.groups()
+        # An empty side ("{ => sub}/file.py") leaves a doubled or leading slash behind
+        old_path = (prefix + old + suffix).replace('//', '/').lstrip('/')
+        new_path = (prefix + new + suffix).replace('//', '/').lstrip('/')
+        return old_path, new_path
+
+    old_path, new_path = path.split(' => ', 1)
+    return old_path, new_path
+
+
+def iter_log_commits(repo_path: str, extra_args: Optional[List[str]] = None,
+                     revs: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Streams `git log --numstat -M` once and yields one record per commit.
+
+    Each record has 'sha', 'author_email', 'timestamp', 'message', 'is_bug_fix'
+    and 'files', a list of (lines_added, lines_removed, path, old_path) tuples, where
+    old_path is the file's previous name if the commit renamed it (None otherwise).
+    Binary files report 0/0. Commits come newest first and always before their parents.
+    With `revs`, exactly those commits are read, in the given order (used by shards).
+    """
+    cmd = [
+        'git', '-C', repo_path, '-c', 'core.quotePath=false', 'log',
+        '--numstat', '-M', '--topo-order', f'--format={LOG_FORMAT}'
+    ]
+    if extra_args:
+        cmd.extend(extra_args)
+
+    stdin_file = None
+    if revs is not None:
+        cmd.extend(['--no-walk=unsorted', '--stdin'])
+        stdin_file = tempfile.TemporaryFile()
+        stdin_file.write(''.join(f'{rev}\n' for rev in revs).encode('ascii'))
+        stdin_file.seek(0)
+
+    # Rename detection may warn once per huge commit; a file can't fill up like a pipe would
+    stderr_file = tempfile.TemporaryFile()
+    proc = subprocess.Popen(
+        cmd, stdin=stdin_file, stdout=subprocess.PIPE, stderr=stderr_file,
+        text=True, encoding='utf-8', errors='replace'
+    )
+
+    commit: Optional[Dict[str, Any]] = None
+    header: Optional[List[str]] = None
 
-def analyze_git_history(repo_path: str, all_file_data: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
-    """Analyzes Git history for churn, authorship, and bug fixes."""
     try:
-        repo = git.Repo(repo_path)
+        for line in proc.stdout:
+            line = line.rstrip('\n')
+
+            # 1. Commit header (may span several lines because of the message body)
+            if line.startswith(RECORD_START):
+                if commit is not None:
+                    yield commit
+                commit = None
+                header = [line[1:]]
+            elif header is not None:
+                header.append(line)
+
+            if header is not None:
+                if HEADER_END not in header[-1]:
+                    continue
+                header[-1] = header[-1].split(HEADER_END, 1)[0]
+                sha, author_email, timestamp, message = '\n'.join(header).split(FIELD_SEP, 3)
+                commit = {
+                    'sha': sha,
+                    'author_email': author_email,
+                    'timestamp': int(timestamp or 0),
+                    'message': message,
+                    'is_bug_fix': is_bug_fix_message(message),
+                    'files': []
+                }
+                header = None
+                continue
+
+            # 2. Numstat lines: "<added>\t<removed>\t<path>"
+            if commit is None or not line:
+                continue
+            parts = line.split('\t', 2)
+            if len(parts) != 3:
+                continue
+            added, removed, path = parts
+            old_path, path = parse_numstat_path(path)
+            commit['files'].append((
+                int(added) if added.isdigit() else 0,
+                int(removed) if removed.isdigit() else 0,
+                path,
+                old_path
+            ))
+
+        if commit is not None:
+            yield commit
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode('utf-8', errors='replace')
+        stderr_file.close()
+        if stdin_file is not None:
+            stdin_file.close()
+
+    if returncode != 0:
+        raise git.GitCommandError(cmd, returncode, stderr)
+
+
+def is_shallow_repository(repo_path: str) -> bool:
+    """True for `--depth` / `--shallow-since` clones, whose history is truncated."""
+    return subprocess.run(
+        ['git', '-C', repo_path, 'rev-parse', '--is-shallow-repository'],
+        capture_output=True, text=True, check=False
+    ).stdout.strip() == 'true'
+
+
+def list_commit_shards(repo_path: str, log_range: str, shards: int) -> Tuple[List[List[str]], Optional[int]]:
+    """
+    Splits the commits of `log_range` into up to `shards` contiguous runs, newest run first.
+
+    Runs follow `--topo-order`, so concatenating them reproduces the single-pass order.
+    Returns a single run when the range is too small for parallelism to pay off, along
+    with the author timestamp of the first (newest) commit, the reference time a single
+    pass would use (tally_commits reads author dates, which a rebase or cherry-pick
+    leaves behind the committer date).
+    """
+    result = subprocess.run(
+        ['git', '-C', repo_path, 'rev-list', '--topo-order', log_range],
+        capture_output=True, text=True, check=False
+    )
+    if result.returncode != 0:
+        raise git.GitCommandError(['git', 'rev-list', log_range], result.returncode, result.stderr)
+
+    shas = result.stdout.split()
+    reference_time = None
+    if shas:
+        author_time = subprocess.run(
+            ['git', '-C', repo_path, 'log', '-1', '--format=%at', shas[0]],
+            capture_output=True, text=True, check=False
+        ).stdout.strip()
+        reference_time = int(author_time) if author_time else None
+    shards = max(1, min(shards, len(shas) // HISTORY_SHARD_MIN_COMMITS))
+    size = -(-len(shas) // shards)
+    return [shas[start:start + size] for start in range(0, len(shas), size)], reference_time
+
+
+def _read_log_shard(repo_path: str, shas: List[str]) -> List[Dict[str, Any]]:
+    """Process-pool worker: commit records of one shard (messages dropped, they aren't indexed)."""
+    commits = list(iter_log_commits(repo_path, revs=shas))
+    for commit in commits:
+        del commit['message']
+    return commits
+
+
+def read_log_commits(repo_path: str, log_range: str, shards: int = 1) -> List[Dict[str, Any]]:
+    """All commit records of `log_range` in log order, read by up to `shards` parallel `git log` processes."""
+    runs = list_commit_shards(repo_path, log_range, shards)[0] if shards > 1 else []
+    if len(runs) <= 1:
+        return list(iter_log_commits(repo_path, [log_range]))
+
+    print(f"⚡ Reading {sum(len(run) for run in runs)} commits in {len(runs)} parallel shards...")
+    with ProcessPoolExecutor(max_workers=len(runs), mp_context=POOL_CONTEXT) as executor:
+        return [commit for shard in executor.map(_read_log_shard, [repo_path] * len(runs), runs) for commit in shard]
+
+
+def sync_history_index(conn, repo_path: str, shards: int = 1) -> int:
+    """
+    Brings a repository's history index up to date with the checkout's HEAD.
+
+    Only commits after the last recorded HEAD are read from git. If that commit is no
+    longer an ancestor of HEAD (force push, different default branch) the index is rebuilt.
+    With `shards` > 1 a large range is read by parallel `git log` processes.
+    The log is read outside any transaction, so a long first build doesn't block other
+    analyses of the same repo; the write lock is only taken to store the new commits, and
+    if another analysis moved the index in the meantime the range is worked out again.
+    Returns the number of newly indexed commits.
+    """
+    head = subprocess.run(
+        ['git', '-C', repo_path, 'rev-parse', 'HEAD'], capture_output=True, text=True, check=False
+    ).stdout.strip()
+    if not head:
+        return 0
+
+    while True:
+        last_head = get_meta(conn, 'last_head')
+        if last_head == head:
+            return 0
+
+        is_ancestor = last_head and subprocess.run(
+            ['git', '-C', repo_path, 'merge-base', '--is-ancestor', last_head, head],
+            capture_output=True, check=False
+        ).returncode == 0
+        log_range = f'{last_head}..{head}' if is_ancestor else head
+        new_commits = read_log_commits(repo_path, log_range, shards)
+
+        with index_transaction(conn):
+            if get_meta(conn, 'last_head') != last_head:
+                continue # Another analysis updated the index while we were reading
+
+            if not is_ancestor:
+                if last_head:
+                    print("⚠️ History index no longer matches the repository. Rebuilding it.")
+                clear_history_index(conn)
+            store_commits(conn, new_commits)
+            set_meta(conn, 'last_head', head)
+        return len(new_commits)
+
+
+def tally_commits(commits: Iterable[Dict[str, Any]], history: Dict[str, Dict[str, Any]],
+                  current_paths: Dict[str, Optional[str]], track_all: bool = False,
+                  reference_time: Optional[int] = None) -> Optional[int]:
+    """
+    Adds churn, bug fixes and authorship from a stream of commit records into `history`.
+
+    Commits must arrive newest first (as `git log` and the history index yield them), so
+    renames can be followed backwards: once a commit moved `old` to a tracked path, older
+    changes to `old` count towards the file's current path. `current_paths` maps each
+    historical path to the path it is tallied under (None once the name no longer refers
+    to a tracked file) and is updated in place. With `track_all`, paths not in the map
+    are tallied under their own name, which is how shards that don't know the final
+    paths yet work.
+
+    Windowed and decayed metrics are relative to `reference_time`, by default the first
+    (newest) commit's timestamp, so results depend on the history only, not on the clock.
+    Returns the reference time used.
+    """
+    decay_rate = math.log(2) / (CHURN_HALF_LIFE_DAYS * SECONDS_PER_DAY)
+
+    for commit in commits:
+        is_bug_fix = commit['is_bug_fix']
+        author_email = commit['author_email']
+        timestamp = commit['timestamp']
+        renames: List[Tuple[str, str, str]] = []
+
+        # Computed once per commit: its decay weight and the windows it falls into
+        if reference_time is None:
+            reference_time = timestamp
+        age = max(0, reference_time - timestamp)
+        decay = math.exp(-decay_rate * age)
+        windows = [fields for fields in WINDOW_FIELDS if age <= fields[0] * SECONDS_PER_DAY]
+
+        for added, removed, path, old_path in commit['files']:
+            current_path = current_paths.get(path, path if track_all else None)
+            if current_path is None:
+                continue
+            if old_path:
+                renames.append((path, old_path, current_path))
+            file_history = history.get(current_path)
+            if file_history is None:
+                file_history = history[current_path] = empty_history()
+
+            # 1. Commit count and authorship
+            file_history['commit_count'] += 1
+            authors = file_history['author_commits']
+            authors[author_email] = authors.get(author_email, 0) + 1
+            last_commits = file_history['author_last_commit']
+            if timestamp > last_commits.get(author_email, -1):
+                last_commits[author_email] = timestamp
+
+            # 2. Bug fixes
+            if is_bug_fix:
+                file_history['bug_fix_count'] += 1
+
+            # 3. Churn (lines added/removed)
+            file_history['lines_added'] += added
+            file_history['lines_removed'] += removed
+
+            # 4. Recent activity
+            file_history['decayed_churn'] += (added + removed) * decay
+            file_history['decayed_commits'] += decay
+            if is_bug_fix:
+                file_history['decayed_bug_fixes'] += decay
+            for _, churn, commits_in_window, bug_fixes, _ in windows:
+                file_history[churn] += added + removed
+                file_history[commits_in_window] += 1
+                if is_bug_fix:
+                    file_history[bug_fixes] += 1
+
+        # Before this commit the files lived under their old names (applied after the whole
+        # commit, so swaps like a -> b, b -> a within one commit resolve correctly)
+        for path, _, _ in renames:
+            current_paths[path] = None
+        for _, old_path, current_path in renames:
+            current_paths[old_path] = current_path
+
+    return reference_time
+
+
+def finish_history(history: Dict[str, Dict[str, Any]], reference_time: Optional[int]) -> Dict[str, Dict[str, Any]]:
+    """Fills in the fields derived from the tallies (author counts) and drops the working state."""
+    for file_history in history.values():
+        file_history['unique_author_count'] = len(file_history['author_commits'])
+        last_commits = file_history.pop('author_last_commit')
+        for days, _, _, _, authors in WINDOW_FIELDS:
+            cutoff = (reference_time or 0) - days * SECONDS_PER_DAY
+            file_history[authors] = sum(1 for timestamp in last_commits.values() if timestamp >= cutoff)
+    return history
+
+
+def accumulate_history(commits: Iterable[Dict[str, Any]], tracked_paths: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Tallies churn, bug fixes and authorship per tracked path from a newest-first stream of commits."""
+    history: Dict[str, Dict[str, Any]] = {path: empty_history() for path in tracked_paths}
+    current_paths: Dict[str, Optional[str]] = {path: path for path in history}
+    reference_time = tally_commits(commits, history, current_paths)
+    return finish_history(history, reference_time)
+
+
+def merge_file_history(target: Dict[str, Any], other: Dict[str, Any]):
+    """Adds one file's tallies into another's (sums and maxima, so shards merge in any grouping)."""
+    for field in SUMMED_FIELDS:
+        target[field] += other[field]
+    authors = target['author_commits']
+    for author_email, count in other['author_commits'].items():
+        authors[author_email] = authors.get(author_email, 0) + count
+    last_commits = target['author_last_commit']
+    for author_email, timestamp in other['author_last_commit'].items():
+        if timestamp > last_commits.get(author_email, -1):
+            last_commits[author_email] = timestamp
+
+
+def _tally_log_shard(repo_path: str, shas: List[str],
+                     reference_time: Optional[int]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Optional[str]]]:
+    """
+    Process-pool worker: tallies one run of commits.
+
+    Every path is tallied under its name as of the run's newest commit. Also returns
+    the run's rename map (name at its oldest commit -> name at its newest, None if the
+    name was given up), which is all the merge needs to attribute older runs correctly.
+    """
+    history: Dict[str, Dict[str, Any]] = {}
+    current_paths: Dict[str, Optional[str]] = {}
+    tally_commits(iter_log_commits(repo_path, revs=shas), history, current_paths,
+                  track_all=True, reference_time=reference_time)
+    return history, current_paths
+
+
+def merge_history_shards(shards: Iterable[Tuple[Dict[str, Dict[str, Any]], Dict[str, Optional[str]]]],
+                         tracked_paths: Iterable[str], reference_time: Optional[int]) -> Dict[str, Dict[str, Any]]:
+    """Folds shard results (newest run first) into per-tracked-path history, following renames across runs."""
+    history: Dict[str, Dict[str, Any]] = {path: empty_history() for path in tracked_paths}
+    # Name as of the newest commit of the next (older) run -> tracked path
+    current_paths: Dict[str, str] = {path: path for path in history}
+
+    for shard_history, shard_paths in shards:
+        for shard_path, file_history in shard_history.items():
+            current_path = current_paths.get(shard_path)
+            if current_path is not None:
+                merge_file_history(history[current_path], file_history)
+
+        older_paths = {path: current for path, current in current_paths.items() if path not in shard_paths}
+        for old_path, shard_path in shard_paths.items():
+            if shard_path is not None and shard_path in current_paths:
+                older_paths[old_path] = current_paths[shard_path]
+        current_paths = older_paths
+
+    return finish_history(history, reference_time)
+
+
+def accumulate_history_sharded(repo_path: str, tracked_paths: Iterable[str], shards: int) -> Dict[str, Dict[str, Any]]:
+    """Like accumulate_history over the whole log, with commit runs tallied by parallel processes."""
+    runs, reference_time = list_commit_shards(repo_path, 'HEAD', shards)
+    if len(runs) <= 1:
+        return accumulate_history(iter_log_commits(repo_path), tracked_paths)
+
+    print(f"⚡ Tallying {sum(len(run) for run in runs)} commits in {len(runs)} parallel shards...")
+    with ProcessPoolExecutor(max_workers=len(runs), mp_context=POOL_CONTEXT) as executor:
+        shard_results = executor.map(
+            _tally_log_shard, [repo_path] * len(runs), runs, [reference_time] * len(runs)
+        )
+        return merge_history_shards(shard_results, tracked_paths, reference_time)
+
+
+def analyze_git_history(repo_path: str, all_file_data: Dict[str, Dict[str, Any]], repo_url: Optional[str] = None,
+                        shards: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Analyzes Git history for churn, authorship, and bug fixes in a single `git log` pass.
+
+    When `repo_url` is given, commits are kept in a persistent per-repo history index and
+    only commits added since the previous analysis are read from git. With `shards` > 1
+    (default: HISTORY_SHARDS), large histories are split into commit runs that are read
+    by a process pool and merged, with the same result as one pass.
+    """
+    shards = HISTORY_SHARDS if shards is None else shards
+    try:
+        git.Repo(repo_path)
     except git.InvalidGitRepositoryError:
         print("❌ Not a valid Git repository. Skipping history analysis.")
         return all_file_data
 
-    # Define common bug keywords
-    BUG_KEYWORDS = ['fix', 'bug', 'error', 'broken', 'issue', 'hotfix']
-
-    for file_path in list(all_file_data.keys()):
-        file_data = all_file_data[file_path]
-        
-        total_lines_added = 0
-        total_lines_removed = 0
-        total_commit_count = 0
-        unique_authors: Dict[str, int] = {}
-        bug_fix_count = 0
-        
-        try:
-            # Iterate through commits affecting the file
-            for commit in repo.iter_commits(paths=file_path, reverse=True):
-                total_commit_count += 1
-                
-                # 1. Authorship
-                author_email = commit.author.email
-                unique_authors[author_email] = unique_authors.get(author_email, 0) + 1
-                
-                # 2. Bug Fixes
-                if any(keyword in commit.message.lower() for keyword in BUG_KEYWORDS):
-                    bug_fix_count += 1
-                
-                # 3. Churn (lines added/removed)
-                if commit.parents:
-                    diff_index = commit.tree.diff(commit.parents[0].tree, paths=[file_path])
-                    
-                    for diff in diff_index:
-                        if diff.change_type in ('M', 'A', 'D'):
-                            # Need to handle case where file is deleted (D) or added (A)
-                            if diff.a_path == file_path and diff.b_path: # Modified
-                                try:
-                                    # Get diff statistics (this can be expensive)
-                                    stats = repo.git.diff(commit.parents[0].hexsha, commit.hexsha, '--numstat', '--', file_path).splitlines()
-                                    if stats:
-                                        added, removed, _ = stats[0].split('\t')
-                                        total_lines_added += int(added)
-                                        total_lines_removed += int(removed)
-                                except Exception:
-                                    pass # Ignore diff stat errors
-
-            # Update the file data with historical metrics
-            file_data.update({
-                'commit_count': total_commit_count,
-                'lines_added': total_lines_added,
-                'lines_removed': total_lines_removed,
-                'unique_author_count': len(unique_authors),
-                'bug_fix_count': bug_fix_count,
-                'author_commits': unique_authors # Detailed authorship for entropy calculation
-            })
-            
-        except git.GitCommandError as e:
-            # This can happen if a file was moved or deleted in the history
-            print(f"⚠️ Git history error for {file_path}: {e}")
-            # Ensure basic data is still present if analysis failed
-            file_data.update({
-                'commit_count': 0, 'lines_added': 0, 'lines_removed': 0, 
-                'unique_author_count': 0, 'bug_fix_count': 0, 'author_commits': {}
-            })
-            
-    return all_file_data
\ No newline at end of file
+    # Git always reports POSIX paths; map them back onto the static analyzer's keys
+    tracked_paths = {path.replace(os.sep, '/'): path for path, _ in iter_files(all_file_data)}
+
+    # A shallow clone only sees recent history; don't let it overwrite the persistent index
+    if repo_url and is_shallow_repository(repo_path):
+        print("ℹ️ Shallow clone detected. Analyzing its truncated history without the history index.")
+        repo_url = None
+
+    try:
+        history = None
+        if repo_url:
+            try:
+                conn = open_history_index(repo_url)
+                try:
+                    try:
+                        new_commit_count = sync_history_index(conn, repo_path, shards)
+                        print(f"🗂️ History index updated with {new_commit_count} new commits.")
+                    except git.GitCommandError as e:
+                        # Stale history beats none: keep using what was indexed by earlier runs
+                        print(f"⚠️ Could not update the history index, using the previously indexed commits: {e}")
+                    history = accumulate_history(iter_indexed_commits(conn), tracked_paths)
+                finally:
+                    conn.close()
+            except sqlite3.OperationalError as e:
+                # Index locked for too long (or unreadable): read the log directly instead
+                print(f"⚠️ History index unavailable, reading the full log instead: {e}")
+
+        if history is None and shards > 1:
+            history = accumulate_history_sharded(repo_path, tracked_paths, shards)
+        elif history is None:
+            history = accumulate_history(iter_log_commits(repo_path), tracked_paths)
+
+    except git.GitCommandError as e:
+        # This can happen on empty repositories or corrupted histories
+        print(f"⚠️ Git history error: {e}")
+        history = finish_history({path: empty_history() for path in tracked_paths}, None)
+
+    # Update the file data with historical metrics
+    if isinstance(all_file_data, FileTable):
+        all_file_data.update_files((tracked_paths[posix_path], file_history) for posix_path, file_history in history.items())
+        return all_file_data
+
+    for posix_path, file_history in history.items():
+        all_file_data[tracked_paths[posix_path]].update(file_history)
+
+    return all_file_data
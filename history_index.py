@@ -0,0 +1,140 @@
+import hashlib
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional
+
+# One SQLite file per repository URL lives in this directory
+HISTORY_INDEX_DIR = os.environ.get(
+    'GITDEBT_HISTORY_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'gitdebt', 'history')
+)
+
+# Bump when the tables change; older indexes are dropped and rebuilt from git
+INDEX_SCHEMA_VERSION = '2'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS commits (
+    sha TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    author_email TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    is_bug_fix INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_changes (
+    sha TEXT NOT NULL,
+    path TEXT NOT NULL,
+    lines_added INTEGER NOT NULL,
+    lines_removed INTEGER NOT NULL,
+    old_path TEXT,
+    PRIMARY KEY (sha, path)
+);
+CREATE INDEX IF NOT EXISTS idx_commits_seq ON commits (seq);
+"""
+
+
+def index_path_for(repo_url: str) -> str:
+    """Returns the on-disk index file for a repository URL."""
+    digest = hashlib.sha256(repo_url.strip().rstrip('/').encode('utf-8')).hexdigest()[:24]
+    return os.path.join(HISTORY_INDEX_DIR, f"{digest}.sqlite")
+
+
+def open_history_index(repo_url: str) -> sqlite3.Connection:
+    """Opens (and creates if needed) the history index for a repository URL."""
+    os.makedirs(HISTORY_INDEX_DIR, exist_ok=True)
+    conn = sqlite3.connect(index_path_for(repo_url), timeout=60, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(SCHEMA)
+
+    with index_transaction(conn):
+        if get_meta(conn, 'schema_version') != INDEX_SCHEMA_VERSION:
+            # Written by an older version: start over (the next sync re-reads the whole history)
+            for table in ('file_changes', 'commits', 'meta'):
+                conn.execute(f'DROP TABLE {table}')
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+            set_meta(conn, 'schema_version', INDEX_SCHEMA_VERSION)
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('repo_url', ?)", (repo_url,))
+    return conn
+
+
+def get_meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    """Reads a value from the index's meta table."""
+    row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_meta(conn: sqlite3.Connection, key: str, value: str):
+    """Writes a value to the index's meta table."""
+    conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+
+@contextmanager
+def index_transaction(conn: sqlite3.Connection):
+    """Exclusive write transaction so concurrent analyses of one repo don't interleave."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def clear_history_index(conn: sqlite3.Connection):
+    """Drops every indexed commit, e.g. after a force push rewrote history."""
+    conn.execute('DELETE FROM file_changes')
+    conn.execute('DELETE FROM commits')
+
+
+def store_commits(conn: sqlite3.Connection, commits: List[Dict[str, Any]]):
+    """
+    Appends commits (newest first, as `git log` yields them) to the index.
+
+    They must all be newer than anything already stored: `seq` grows towards
+    newer commits so ORDER BY seq DESC reproduces log order across updates.
+    """
+    max_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM commits').fetchone()[0]
+
+    for offset, commit in enumerate(commits):
+        conn.execute(
+            'INSERT OR IGNORE INTO commits (sha, seq, author_email, timestamp, is_bug_fix) VALUES (?, ?, ?, ?, ?)',
+            (commit['sha'], max_seq + len(commits) - offset, commit['author_email'],
+             commit['timestamp'], int(commit['is_bug_fix']))
+        )
+        conn.executemany(
+            'INSERT OR IGNORE INTO file_changes (sha, path, lines_added, lines_removed, old_path) VALUES (?, ?, ?, ?, ?)',
+            [(commit['sha'], path, added, removed, old_path) for added, removed, path, old_path in commit['files']]
+        )
+
+
+def iter_indexed_commits(conn: sqlite3.Connection) -> Iterator[Dict[str, Any]]:
+    """Yields indexed commits newest first, in the same record shape as `iter_log_commits`."""
+    cursor = conn.execute(
+        'SELECT c.sha, c.author_email, c.timestamp, c.is_bug_fix, f.path, f.lines_added, f.lines_removed, f.old_path '
+        'FROM commits c LEFT JOIN file_changes f ON f.sha = c.sha '
+        'ORDER BY c.seq DESC'
+    )
+
+    commit: Optional[Dict[str, Any]] = None
+    for sha, author_email, timestamp, is_bug_fix, path, added, removed, old_path in cursor:
+        if commit is None or commit['sha'] != sha:
+            if commit is not None:
+                yield commit
+            commit = {
+                'sha': sha,
+                'author_email': author_email,
+                'timestamp': timestamp,
+                'is_bug_fix': bool(is_bug_fix),
+                'files': []
+            }
+        if path is not None:
+            commit['files'].append((added, removed, path, old_path))
+
+    if commit is not None:
+        yield commit
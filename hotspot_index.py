@@ -0,0 +1,71 @@
+import heapq
+import os
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from file_table import iter_files
+
+# Field order of the compact per-symbol records produced by static_analyzer ('symbols' key)
+SYMBOL_FIELDS = ('kind', 'name', 'start_line', 'end_line', 'complexity', 'loc')
+SYMBOL_KINDS = ('function', 'class')
+
+# How many of the most complex symbols of each kind are kept per analysis
+HOTSPOT_INDEX_SIZE = int(os.environ.get('GITDEBT_HOTSPOT_INDEX_SIZE', '200'))
+
+
+def symbol_record(record: List[Any], path: str) -> Dict[str, Any]:
+    """Expands a compact symbol record into a dict, tagged with the file it was found in."""
+    return {'path': path, **dict(zip(SYMBOL_FIELDS, record))}
+
+
+class HotspotIndex:
+    """
+    Top-N most complex functions and classes across a repository.
+
+    One bounded min-heap per symbol kind, so adding a symbol is O(log N) and the
+    index never holds more than `size` records per kind however large the repo is.
+    Ties on complexity are broken by LOC, so of two equally branchy functions the
+    longer one ranks first.
+    """
+
+    def __init__(self, size: int = HOTSPOT_INDEX_SIZE):
+        self.size = size
+        self._heaps: Dict[str, List[Tuple[int, int, int, str, List[Any]]]] = {kind: [] for kind in SYMBOL_KINDS}
+        self._counter = 0  # Insertion order; keeps heap entries comparable without comparing records
+
+    def add(self, path: str, record: List[Any]):
+        heap = self._heaps.setdefault(record[0], [])
+        # complexity, loc, then earlier insertions win ties (the counter is negated)
+        entry = (record[4], record[5], -self._counter, path, record)
+        self._counter += 1
+        if len(heap) < self.size:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    def add_file(self, path: str, symbols: Iterable[List[Any]]):
+        for record in symbols:
+            self.add(path, record)
+
+    def top(self, limit: Optional[int] = None, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The `limit` most complex symbols (of one kind, or of all kinds), most complex first."""
+        entries = self._heaps.get(kind, []) if kind else [e for heap in self._heaps.values() for e in heap]
+        limit = len(entries) if limit is None else limit
+        return [symbol_record(entry[4], entry[3]) for entry in heapq.nlargest(limit, entries)]
+
+
+def build_hotspot_index(all_file_data: Dict[str, Any], size: int = HOTSPOT_INDEX_SIZE) -> HotspotIndex:
+    """Builds the index from the 'symbols' records static analysis stored on each file."""
+    index = HotspotIndex(size)
+    for path, data in iter_files(all_file_data):
+        symbols = data.get('symbols')
+        if symbols:
+            index.add_file(path, symbols)
+    return index
+
+
+def select_hotspots(hotspots: List[Dict[str, Any]], limit: Optional[int] = None,
+                    kind: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Filters an already ranked hotspot list (e.g. a stored '_hotspots' entry) by kind and length."""
+    if kind:
+        hotspots = [h for h in hotspots if h['kind'] == kind]
+    return hotspots[:limit] if limit is not None else hotspots
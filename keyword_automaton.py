@@ -0,0 +1,125 @@
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Dead state: no keyword continues from here (row 0 of the transition table maps everything to 0)
+DEAD_STATE = 0
+ROOT_STATE = 1
+# Start positions handled per step, so the temporary state/position arrays stay a few MB for any buffer size
+CHUNK_SIZE = 1 << 20
+
+
+class KeywordAutomaton:
+    """
+    Counts the occurrences of every keyword in one pass over a byte buffer, ASCII case-insensitively.
+
+    The keywords are compiled into a trie-shaped automaton whose transition table works on
+    byte classes (each byte that appears in a keyword, with upper- and lower-case letters
+    folded together, plus one class for everything else). Instead of following failure links
+    byte by byte, the automaton is run from every start position at once with NumPy: each step
+    advances all still-live positions by one byte and drops the ones that hit the dead state.
+    The buffer is read in place and handled CHUNK_SIZE start positions at a time. Matches are
+    counted leftmost-longest without overlaps, like a regex alternation that tries longer keywords
+    first: 'apikey' counts once as 'apikey', not also as 'api'. The cost depends on the buffer
+    and the longest keyword, not on how many keywords there are.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = list(dict.fromkeys(keyword.lower() for keyword in keywords if keyword))
+        encoded = [keyword.encode('utf-8') for keyword in self.keywords]
+        self.max_length = max((len(keyword) for keyword in encoded), default=0)
+
+        # Byte -> class; class 0 is "not in any keyword"
+        byte_class = np.zeros(256, dtype=np.intp)
+        for byte in sorted(set(b''.join(encoded))):
+            byte_class[byte] = byte_class.max() + 1
+        for byte in range(ord('a'), ord('z') + 1):
+            byte_class[byte - 32] = byte_class[byte] # Fold 'A'-'Z' onto 'a'-'z'
+        self._byte_class = byte_class
+
+        # Trie over byte classes; state 0 is dead, state 1 the root
+        transitions: List[Dict[int, int]] = [{}, {}]
+        terminal = [-1, -1]
+        for keyword_id, keyword in enumerate(encoded):
+            state = ROOT_STATE
+            for byte in keyword:
+                cls = int(byte_class[byte])
+                if cls not in transitions[state]:
+                    transitions[state][cls] = len(transitions)
+                    transitions.append({})
+                    terminal.append(-1)
+                state = transitions[state][cls]
+            terminal[state] = keyword_id
+
+        self._delta = np.zeros((len(transitions), int(byte_class.max()) + 1), dtype=np.int32)
+        for state, edges in enumerate(transitions):
+            for cls, target in edges.items():
+                self._delta[state, cls] = target
+        self._terminal = np.array(terminal, dtype=np.int64)
+        # Root transitions per raw byte: the first step runs over the whole buffer, so it skips the class lookup
+        self._first_state = self._delta[ROOT_STATE][byte_class]
+
+    def _longest_matches(self, buffer: np.ndarray, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Start positions in [start, stop) where a keyword matches, with the id and length of the longest one there."""
+        states = self._first_state[buffer[start:stop]]
+        starts = np.flatnonzero(states)
+        states = states[starts]
+        starts += start
+        best_id = np.full(len(starts), -1, dtype=np.int64)
+        best_length = np.zeros(len(starts), dtype=np.int64)
+
+        live = np.arange(len(starts)) # Indices into starts of the positions still on the trie
+        for depth in range(1, self.max_length + 1):
+            matched = self._terminal[states]
+            hit = matched >= 0
+            best_id[live[hit]] = matched[hit] # Deeper matches overwrite shorter ones
+            best_length[live[hit]] = depth
+            if depth == self.max_length:
+                break
+
+            # Advance every live start position by one byte; those that fall off the trie are dropped
+            in_range = starts[live] < len(buffer) - depth
+            live, states = live[in_range], states[in_range]
+            states = self._delta[states, self._byte_class[buffer[starts[live] + depth]]]
+            alive = states != DEAD_STATE
+            live, states = live[alive], states[alive]
+            if not len(states):
+                break
+
+        found = best_id >= 0
+        return starts[found], best_id[found], best_length[found]
+
+    def count_array(self, data: bytes) -> np.ndarray:
+        """Occurrences of each keyword in `data`, as an array aligned with self.keywords."""
+        counts = np.zeros(len(self.keywords), dtype=np.int64)
+        if not self.keywords or not data:
+            return counts
+
+        buffer = np.frombuffer(data, dtype=np.uint8) # A view, the data is not copied
+        next_free = 0 # First position not covered by the last counted match
+        for start in range(0, len(buffer), CHUNK_SIZE):
+            positions, keyword_ids, lengths = self._longest_matches(buffer, start, min(start + CHUNK_SIZE, len(buffer)))
+            if not len(positions):
+                continue
+
+            ends = positions + lengths
+            if positions[0] >= next_free and np.all(positions[1:] >= ends[:-1]):
+                # No overlaps (the usual case): count them all at once
+                counts += np.bincount(keyword_ids, minlength=len(self.keywords))
+                next_free = int(ends[-1])
+                continue
+
+            # A match starting inside the previous counted one is part of it
+            for position, keyword_id, end in zip(positions.tolist(), keyword_ids.tolist(), ends.tolist()):
+                if position >= next_free:
+                    counts[keyword_id] += 1
+                    next_free = end
+        return counts
+
+    def count(self, data: bytes) -> Dict[str, int]:
+        """Occurrences of each keyword in `data`, keyed by the (lower-cased) keyword."""
+        return dict(zip(self.keywords, self.count_array(data).tolist()))
+
+    def total(self, data: bytes) -> int:
+        """All keyword occurrences in `data` added up."""
+        return int(self.count_array(data).sum())
@@ -1,9 +1,23 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 import math
+import os
 import statistics
 import datetime
 from operator import itemgetter
 
+import numpy as np
+
+from file_table import FileTable, iter_files
+
+RISK_WEIGHTS = {'complexity': 0.30, 'churn': 0.20, 'ownership_entropy': 0.15, 'bug_fix_frequency': 0.25, 'dependency_score': 0.10}
+
+# Share of the churn and bug-fix terms taken from decay-weighted (recent) history instead of lifetime totals.
+# 0 scores on lifetime totals only, 1 on recent activity only.
+RECENCY_WEIGHT = float(os.environ.get('GITDEBT_RECENCY_WEIGHT', '0'))
+
+# Bus factor: smallest number of authors who together made at least this share of a file's commits
+BUS_FACTOR_SHARE = 0.5
+
 def assign_test_coverage_status(path: str) -> float:
     """
     Simulates checking for test coverage based on file name patterns.
@@ -25,89 +39,206 @@ def assign_test_coverage_status(path: str) -> float:
     # Standard source files (moderate penalty)
     return 0.5 
 
-def compute_advanced_metrics(all_file_data: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+def build_metric_columns(all_file_data: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
     """
-    Calculates technical debt risk scores, ownership entropy, and the new Systemic Risk Score.
+    Loads the per-file metrics into NumPy columns (one array per metric, aligned on 'paths').
+
+    Only real file entries with LOC > 0 are included; stats entries like '_repo_stats' are skipped.
+    For a FileTable the columns are sliced straight out of the table ('rows' holds the
+    selected row numbers); old-style dicts are read file by file. Ownership entropy and
+    bus factor are derived here from the author-commit counts (see ownership_metrics).
     """
-    
-    repo_stats = all_file_data.get('_repo_stats', {})
-    
-    # --- 1. First Pass: Calculate and Normalize Max Values ---
-    
-    # Identify files to process (exclude stats entries)
-    file_entries = {path: data for path, data in all_file_data.items() if not path.startswith('_') and data.get('loc', 0) > 0}
-    
+    if isinstance(all_file_data, FileTable):
+        rows = np.flatnonzero(all_file_data.column('loc') > 0)
+        paths: List[str] = [all_file_data.paths[row] for row in rows.tolist()]
+
+        def column(key: str, default: float = 0) -> np.ndarray:
+            return all_file_data.column(key, default)[rows]
+
+        indptr, _, author_counts = all_file_data.author_matrix()
+        ownership_entropy, bus_factor = ownership_metrics(indptr, author_counts)
+        ownership_entropy, bus_factor = ownership_entropy[rows], bus_factor[rows]
+    else:
+        rows = None
+        paths = [path for path, data in iter_files(all_file_data) if data.get('loc', 0) > 0]
+        entries = [all_file_data[path] for path in paths]
+        count = len(paths)
+
+        def column(key: str, default: float = 0) -> np.ndarray:
+            return np.fromiter((d.get(key, default) for d in entries), dtype=np.float64, count=count)
+
+        author_commits = [list(d.get('author_commits', {}).values()) for d in entries]
+        indptr = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum([len(counts) for counts in author_commits], out=indptr[1:])
+        author_counts = np.fromiter((c for counts in author_commits for c in counts), dtype=np.float64, count=indptr[-1])
+        ownership_entropy, bus_factor = ownership_metrics(indptr, author_counts)
+
+    return {
+        'paths': paths,
+        'rows': rows,
+        'complexity': column('complexity'),
+        'lines_added': column('lines_added'),
+        'lines_removed': column('lines_removed'),
+        'ownership_entropy': ownership_entropy,
+        'bus_factor': bus_factor,
+        'commit_count': column('commit_count'),
+        'bug_fix_count': column('bug_fix_count'),
+        'decayed_churn': column('decayed_churn', 0.0),
+        'decayed_commits': column('decayed_commits', 0.0),
+        'decayed_bug_fixes': column('decayed_bug_fixes', 0.0),
+        'fan_in': column('fan_in'),
+        'fan_out': column('fan_out'),
+    }
+
+def ownership_metrics(indptr: np.ndarray, author_counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ownership entropy and bus factor for every file at once, from a CSR author-commit matrix.
+
+    Row r's per-author commit counts are author_counts[indptr[r]:indptr[r + 1]].
+    - ownership_entropy: Shannon entropy of the commit shares, divided by log(#authors), so
+      0 means a single owner and 1 an even split (0 for files with fewer than two authors)
+    - bus_factor: fewest authors whose commits add up to BUS_FACTOR_SHARE of the file's
+      commits (0 for files without history)
+    """
+    count = len(indptr) - 1
+    lengths = np.diff(indptr)
+    author_counts = np.asarray(author_counts, dtype=np.float64)
+    row_ids = np.repeat(np.arange(count), lengths)
+
+    totals = np.bincount(row_ids, weights=author_counts, minlength=count)
+    shares = author_counts / np.where(totals == 0, 1, totals)[row_ids]
+    plogp = np.where(shares > 0, shares * np.log(np.where(shares > 0, shares, 1)), 0.0)
+    entropy = -np.bincount(row_ids, weights=plogp, minlength=count)
+    ownership_entropy = np.where(lengths > 1, entropy / np.log(np.maximum(lengths, 2)), 0.0)
+    ownership_entropy = np.clip(ownership_entropy, 0.0, 1.0)
+
+    # Largest contributors first within each row; count the authors needed before the share is reached
+    order = np.lexsort((-author_counts, row_ids))
+    covered = np.cumsum(author_counts[order])
+    covered -= np.concatenate(([0.0], covered))[indptr[:-1]][row_ids]
+    short_of_share = covered < BUS_FACTOR_SHARE * totals[row_ids]
+    bus_factor = np.bincount(row_ids, weights=short_of_share, minlength=count) + 1
+    bus_factor = np.where(totals > 0, bus_factor, 0).astype(np.int64)
+
+    return ownership_entropy, bus_factor
+
+def normalize_column(values: np.ndarray, max_value: float) -> np.ndarray:
+    """Vectorized normalize_metric with min_value 0: clip to [0, max] and scale to [0, 1]."""
+    if max_value == 0:
+        return np.zeros_like(values)
+    return np.minimum(1.0, np.maximum(values, 0.0) / max_value)
+
+def blend_recency(lifetime: np.ndarray, recent: np.ndarray, recency_weight: float) -> np.ndarray:
+    """Mixes a normalized lifetime term with its normalized recent counterpart."""
+    if recency_weight == 0:
+        return lifetime
+    return lifetime * (1 - recency_weight) + recent * recency_weight
+
+def score_metric_columns(columns: Dict[str, Any], recency_weight: float = 0.0) -> Dict[str, Any]:
+    """
+    Computes risk scores, systemic scores and repository stats as vector operations.
+
+    Adds 'total_churn', 'bug_fix_freq', 'recent_bug_fix_freq', 'dependency_score',
+    'risk_score', 'missing_test_coverage_factor' and 'systemic_risk_score' columns and
+    returns the repository-level 'max_values' and 'overall_technical_debt'.
+    With `recency_weight` > 0 the churn and bug-fix terms blend in decayed churn and
+    decay-weighted bug-fix frequency (see git_history_analyzer.CHURN_HALF_LIFE_DAYS).
+    """
+    has_files = len(columns['paths']) > 0
+
+    columns['total_churn'] = columns['lines_added'] + columns['lines_removed']
+    columns['bug_fix_freq'] = columns['bug_fix_count'] / np.where(columns['commit_count'] == 0, 1, columns['commit_count'])
+    columns['recent_bug_fix_freq'] = columns['decayed_bug_fixes'] / np.where(
+        columns['decayed_commits'] == 0, 1, columns['decayed_commits']
+    )
+    columns['dependency_score'] = columns['fan_in'] * 2 + columns['fan_out'] * 1
+
+    # --- 1. Max Values (defaults match an empty repository) ---
     max_values = {
-        'complexity': max([d.get('complexity', 0) for d in file_entries.values()] or [1]),
-        'total_churn': max([d.get('lines_added', 0) + d.get('lines_removed', 0) for d in file_entries.values()] or [1]),
+        'complexity': columns['complexity'].max().item() if has_files else 1,
+        'total_churn': columns['total_churn'].max().item() if has_files else 1,
         'ownership_entropy': 1.0, # Max is always 1
-        'bug_fix_freq': max([d.get('bug_fix_count', 0) / (d.get('commit_count', 1) or 1) for d in file_entries.values()] or [0.1]),
-        'dependency_score': max([(d.get('fan_in', 0) * 2 + d.get('fan_out', 0) * 1) for d in file_entries.values()] or [1]),
-        'systemic_risk_score': 0.0 # Will be updated in the second pass
+        'bug_fix_freq': columns['bug_fix_freq'].max().item() if has_files else 0.1,
+        'dependency_score': columns['dependency_score'].max().item() if has_files else 1,
+        'decayed_churn': columns['decayed_churn'].max().item() if has_files else 1,
+        'recent_bug_fix_freq': columns['recent_bug_fix_freq'].max().item() if has_files else 0.1,
+        'systemic_risk_score': 0.0,
+        # Kept with the maxima so the main-factor breakdown can blend the same way
+        'recency_weight': recency_weight
     }
 
-    def normalize_metric(value: float, max_value: float, min_value: float = 0.0) -> float:
-        if max_value == min_value or max_value == 0:
-            return 0.0
-        value = max(min_value, value)
-        return min(1.0, (value - min_value) / (max_value - min_value))
+    churn_term = blend_recency(
+        normalize_column(columns['total_churn'], max_values['total_churn']),
+        normalize_column(columns['decayed_churn'], max_values['decayed_churn']),
+        recency_weight
+    )
+    bug_fix_term = blend_recency(
+        normalize_column(columns['bug_fix_freq'], max_values['bug_fix_freq']),
+        normalize_column(columns['recent_bug_fix_freq'], max_values['recent_bug_fix_freq']),
+        recency_weight
+    )
 
-    # --- 2. Second Pass: Calculate Risk and Systemic Scores ---
-    
-    weighted_scores = []
+    # --- 2. Technical Debt Risk Score (0-100) ---
+    columns['risk_score'] = (
+        normalize_column(columns['complexity'], max_values['complexity']) * RISK_WEIGHTS['complexity'] +
+        churn_term * RISK_WEIGHTS['churn'] +
+        normalize_column(columns['ownership_entropy'], max_values['ownership_entropy']) * RISK_WEIGHTS['ownership_entropy'] +
+        bug_fix_term * RISK_WEIGHTS['bug_fix_frequency'] +
+        normalize_column(columns['dependency_score'], max_values['dependency_score']) * RISK_WEIGHTS['dependency_score']
+    ) * 100
+
+    # --- 3. Systemic Risk Score: Fan-In × Risk Score × Missing Test Coverage Factor ---
+    columns['missing_test_coverage_factor'] = np.fromiter(
+        (assign_test_coverage_status(path) for path in columns['paths']),
+        dtype=np.float64, count=len(columns['paths'])
+    )
+    columns['systemic_risk_score'] = columns['fan_in'] * columns['risk_score'] * columns['missing_test_coverage_factor']
+    if has_files:
+        max_values['systemic_risk_score'] = max(0.0, columns['systemic_risk_score'].max().item())
+
+    return {
+        'max_values': max_values,
+        'overall_technical_debt': columns['risk_score'].mean().item() if has_files else 0
+    }
+
+def compute_advanced_metrics(all_file_data: Dict[str, Dict[str, Any]],
+                             recency_weight: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Calculates technical debt risk scores, ownership entropy, and the new Systemic Risk Score.
+
+    The work happens on NumPy columns (see build_metric_columns); results are only
+    written back into the per-file dicts at the end. `recency_weight` (default:
+    RECENCY_WEIGHT) shifts the churn and bug-fix terms towards recent history.
+    """
     
-    for path, data in file_entries.items():
-        
-        # --- A. Technical Debt Risk Score (0-100) ---
-        
-        WEIGHTS = {'complexity': 0.30, 'churn': 0.20, 'ownership_entropy': 0.15, 'bug_fix_frequency': 0.25, 'dependency_score': 0.10}
-        
-        # Normalize the metrics
-        norm_complexity = normalize_metric(data.get('complexity', 0), max_values['complexity'])
-        norm_churn = normalize_metric(data.get('lines_added', 0) + data.get('lines_removed', 0), max_values['total_churn'])
-        norm_entropy = normalize_metric(data.get('ownership_entropy', 0.0), max_values['ownership_entropy'])
-        
-        total_commits = data.get('commit_count', 0)
-        bug_fix_freq = data.get('bug_fix_count', 0) / (total_commits or 1)
-        norm_bug_freq = normalize_metric(bug_fix_freq, max_values['bug_fix_freq'])
-        
-        dependency_score = data.get('fan_in', 0) * 2 + data.get('fan_out', 0) * 1
-        norm_dependency = normalize_metric(dependency_score, max_values['dependency_score'])
-
-        # Calculate weighted sum
-        risk_score = (
-            norm_complexity * WEIGHTS['complexity'] +
-            norm_churn * WEIGHTS['churn'] +
-            norm_entropy * WEIGHTS['ownership_entropy'] +
-            norm_bug_freq * WEIGHTS['bug_fix_frequency'] +
-            norm_dependency * WEIGHTS['dependency_score']
-        ) * 100
-        
-        data['risk_score'] = risk_score
-        
-        # --- B. Systemic Risk Score ---
-        
-        # 1. Get Missing Test Coverage Factor
-        missing_test_coverage_factor = assign_test_coverage_status(path)
-        data['missing_test_coverage_factor'] = missing_test_coverage_factor
+    repo_stats = all_file_data.get('_repo_stats', {})
 
-        # 2. Calculate Systemic Risk Score
-        # Formula: Fan-In × Risk Score × Missing Test Coverage Factor
-        fan_in = data.get('fan_in', 0)
-        
-        systemic_risk_score = fan_in * risk_score * missing_test_coverage_factor
+    columns = build_metric_columns(all_file_data)
+    recency_weight = RECENCY_WEIGHT if recency_weight is None else min(1.0, max(0.0, recency_weight))
+    repo_stats.update(score_metric_columns(columns, recency_weight))
+
+    # --- Write results back to the per-file entries ---
+    if isinstance(all_file_data, FileTable):
+        for name in ('ownership_entropy', 'bus_factor', 'risk_score', 'missing_test_coverage_factor', 'systemic_risk_score'):
+            all_file_data.set_column(name, columns[name], columns['rows'])
+        all_file_data['_repo_stats'] = repo_stats
+        return all_file_data
+
+    for path, ownership_entropy, bus_factor, risk_score, coverage_factor, systemic_risk_score in zip(
+        columns['paths'],
+        columns['ownership_entropy'].tolist(),
+        columns['bus_factor'].tolist(),
+        columns['risk_score'].tolist(),
+        columns['missing_test_coverage_factor'].tolist(),
+        columns['systemic_risk_score'].tolist()
+    ):
+        data = all_file_data[path]
+        data['ownership_entropy'] = ownership_entropy
+        data['bus_factor'] = bus_factor
+        data['risk_score'] = risk_score
+        data['missing_test_coverage_factor'] = coverage_factor
         data['systemic_risk_score'] = systemic_risk_score
-        
-        max_values['systemic_risk_score'] = max(max_values['systemic_risk_score'], systemic_risk_score)
-        
-        # Update the entry
-        all_file_data[path] = data
-        weighted_scores.append(risk_score)
 
-    # --- 3. Final Repository Stats Update ---
-    
-    repo_stats['max_values'] = max_values
-    repo_stats['overall_technical_debt'] = statistics.mean(weighted_scores) if weighted_scores else 0
     all_file_data['_repo_stats'] = repo_stats
     
     return all_file_data
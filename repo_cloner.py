@@ -1,23 +1,225 @@
 import git
 import tempfile
 import os
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
 
-def clone_repository(repo_url: str) -> str | None:
-    """Clones a Git repository into a temporary directory."""
+from static_analyzer import ANALYZE_EXTENSIONS
+
+try:
+    import fcntl  # POSIX only; Windows falls back to in-process locking
+except ImportError:
+    fcntl = None
+
+# Bare mirrors of previously analyzed repositories are kept here between runs
+MIRROR_CACHE_DIR = os.environ.get(
+    'GITDEBT_MIRROR_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'gitdebt', 'mirrors')
+)
+MIRROR_CACHE_MAX_BYTES = int(os.environ.get('GITDEBT_MIRROR_CACHE_MB', '10240')) * 1024 * 1024
+USE_MIRROR_CACHE = os.environ.get('GITDEBT_MIRROR_CACHE', '1') != '0'
+
+# Clone strategies:
+#   full     - every blob of every commit, served through the mirror cache
+#   blobless - `--filter=blob:none`: commits and trees only, blobs fetched on demand
+#              (HEAD's blobs at checkout; `git log --numstat` batch-fetches the ones it diffs,
+#              so bound the history with depth/shallow_since on very large repos)
+#   shallow  - full blobs but only recent history (`--depth` / `--shallow-since`)
+#   sparse   - blobless, and only files with ANALYZE_EXTENSIONS are checked out
+CLONE_STRATEGIES = ('full', 'blobless', 'shallow', 'sparse')
+DEFAULT_CLONE_STRATEGY = os.environ.get('GITDEBT_CLONE_STRATEGY', 'full')
+DEFAULT_SHALLOW_DEPTH = int(os.environ.get('GITDEBT_SHALLOW_DEPTH', '1000'))
+
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _mirror_key(repo_url: str) -> str:
+    return hashlib.sha256(repo_url.strip().rstrip('/').encode('utf-8')).hexdigest()[:24]
+
+
+@contextmanager
+def _mirror_lock(key: str, blocking: bool = True):
+    """Per-repo lock shared by threads (threading.Lock) and processes (flock)."""
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(key, threading.Lock())
+
+    if not thread_lock.acquire(blocking):
+        yield False
+        return
+
+    lock_file = None
     try:
+        if fcntl is not None:
+            lock_file = open(os.path.join(MIRROR_CACHE_DIR, f"{key}.lock"), 'a')
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(lock_file, flags)
+            except BlockingIOError:
+                yield False
+                return
+        yield True
+    finally:
+        if lock_file is not None:
+            lock_file.close()  # Closing the descriptor releases the flock
+        thread_lock.release()
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for file_name in files:
+            try:
+                total += os.lstat(os.path.join(root, file_name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def evict_mirrors(keep_key: str = '') -> None:
+    """Removes least-recently-used mirrors until the cache fits MIRROR_CACHE_MAX_BYTES."""
+    mirrors: List[Tuple[float, int, str]] = []
+    for entry in os.listdir(MIRROR_CACHE_DIR):
+        if not entry.endswith('.git'):
+            continue
+        mirror_path = os.path.join(MIRROR_CACHE_DIR, entry)
+        # The mirror directory's mtime is bumped on every use (see _update_mirror)
+        mirrors.append((os.path.getmtime(mirror_path), _directory_size(mirror_path), entry[:-4]))
+
+    total_size = sum(size for _, size, _ in mirrors)
+    for _, size, key in sorted(mirrors):
+        if total_size <= MIRROR_CACHE_MAX_BYTES:
+            break
+        if key == keep_key:
+            continue
+        # Skip mirrors another request is currently fetching or cloning from
+        with _mirror_lock(key, blocking=False) as acquired:
+            if not acquired:
+                continue
+            shutil.rmtree(os.path.join(MIRROR_CACHE_DIR, f"{key}.git"), ignore_errors=True)
+            total_size -= size
+            print(f"🧹 Evicted cached mirror {key} ({size // (1024 * 1024)} MB)")
+
+
+def _mirror_is_intact(mirror_path: str) -> bool:
+    """True if the mirror is a readable repository whose HEAD resolves to a commit."""
+    try:
+        git.Repo(mirror_path).git.rev_parse('--verify', 'HEAD^{commit}')
+        return True
+    except (git.GitCommandError, git.InvalidGitRepositoryError, git.NoSuchPathError):
+        return False
+
+
+def _update_mirror(repo_url: str, key: str) -> str:
+    """
+    Clones a bare mirror on first use, otherwise fetches into the existing one.
+
+    A failed fetch (network, auth, remote hiccup) keeps the existing mirror, with a warning,
+    so the analysis runs on the last fetched state; only a corrupted or half-written mirror
+    is deleted and re-cloned.
+    """
+    mirror_path = os.path.join(MIRROR_CACHE_DIR, f"{key}.git")
+
+    if os.path.isdir(mirror_path):
+        try:
+            git.Repo(mirror_path).git.remote('update', '--prune')
+        except (git.GitCommandError, git.InvalidGitRepositoryError) as e:
+            if _mirror_is_intact(mirror_path):
+                print(f"⚠️ Warning: Could not fetch into cached mirror {key}, using its last fetched state. Error: {e}")
+            else:
+                print(f"⚠️ Cached mirror {key} is corrupted, re-cloning it.")
+                shutil.rmtree(mirror_path, ignore_errors=True)
+
+    if not os.path.isdir(mirror_path):
+        git.Repo.clone_from(repo_url, mirror_path, mirror=True)
+
+    os.utime(mirror_path, None)
+    return mirror_path
+
+
+@contextmanager
+def locked_mirror(repo_url: str):
+    """
+    Updates the cached bare mirror of repo_url and yields its path, without any checkout.
+
+    The per-repo lock is held until the block exits, so the mirror cannot be fetched
+    into or evicted while it is being analyzed in place (see repo_source.GitObjectSource).
+    """
+    os.makedirs(MIRROR_CACHE_DIR, exist_ok=True)
+    key = _mirror_key(repo_url)
+    with _mirror_lock(key):
+        yield _update_mirror(repo_url, key)
+    evict_mirrors(keep_key=key)
+
+
+def clone_options(strategy: str, depth: Optional[int] = None, shallow_since: Optional[str] = None) -> Dict[str, Any]:
+    """Translates a clone strategy into `git clone` options (GitPython keyword form)."""
+    if strategy not in CLONE_STRATEGIES:
+        raise ValueError(f"Unknown clone strategy '{strategy}'. Choose one of: {', '.join(CLONE_STRATEGIES)}")
+
+    options: Dict[str, Any] = {}
+    if strategy in ('blobless', 'sparse'):
+        options['filter'] = 'blob:none'
+    if strategy == 'sparse':
+        options['sparse'] = True
+    if strategy == 'shallow' and not depth and not shallow_since:
+        depth = DEFAULT_SHALLOW_DEPTH
+    if depth:
+        options['depth'] = depth
+    if shallow_since:
+        options['shallow_since'] = shallow_since
+    return options
+
+
+def clone_repository(repo_url: str, strategy: str = DEFAULT_CLONE_STRATEGY,
+                     depth: Optional[int] = None, shallow_since: Optional[str] = None) -> str | None:
+    """
+    Clones a Git repository into a temporary directory.
+
+    Full clones go through a cached bare mirror: the first request clones it, later
+    requests only fetch new objects. The working copy is then a local clone of the
+    mirror (hardlinked objects when on the same filesystem), so callers may delete it freely.
+    Other strategies (see CLONE_STRATEGIES), or any depth/shallow_since bound, clone
+    directly from the remote with the matching partial/shallow/sparse options.
+    """
+    try:
+        options = clone_options(strategy, depth, shallow_since)
+
         # Use tempfile to create a secure temporary directory
         temp_dir = tempfile.mkdtemp(prefix="gitdebt_")
-        
-        # Clone the repository
-        git.Repo.clone_from(repo_url, temp_dir)
-        
+
+        if options or not USE_MIRROR_CACHE:
+            if options:
+                print(f"📦 Using '{strategy}' clone strategy ({', '.join(f'{k}={v}' for k, v in options.items())})")
+            cloned = git.Repo.clone_from(repo_url, temp_dir, **options)
+            if strategy == 'sparse':
+                # Non-cone patterns match the analyzed extensions in every directory
+                cloned.git.sparse_checkout('set', '--no-cone', *[f'*{ext}' for ext in ANALYZE_EXTENSIONS])
+            return temp_dir
+
+        os.makedirs(MIRROR_CACHE_DIR, exist_ok=True)
+        key = _mirror_key(repo_url)
+
+        # Hold the per-repo lock while fetching and cloning so concurrent requests don't race
+        with _mirror_lock(key):
+            mirror_path = _update_mirror(repo_url, key)
+            cloned = git.Repo.clone_from(mirror_path, temp_dir, local=True)
+            cloned.remote('origin').set_url(repo_url)
+
+        evict_mirrors(keep_key=key)
         return temp_dir
     except git.GitCommandError as e:
         print(f"❌ Git Command Error during cloning: {e}")
         # Clean up the partial directory if it was created
         if 'temp_dir' in locals() and os.path.exists(temp_dir):
-            os.rmdir(temp_dir)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        return None
+    except ValueError as e:
+        print(f"❌ {e}")
         return None
     except Exception as e:
         print(f"❌ An unexpected error occurred during cloning: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,151 @@
+import os
+import subprocess
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+
+class FileEntry(NamedTuple):
+    path: str                # POSIX path relative to the repository root
+    size: int                # Size in bytes
+    blob_id: Optional[str]   # Git blob id, when known
+
+
+class WorkingTreeSource:
+    """Files of a checked-out working tree, read from disk."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def entries(self) -> List[FileEntry]:
+        files: List[FileEntry] = []
+        for dir_path, dir_names, file_names in os.walk(self.root):
+            dir_names[:] = [d for d in dir_names if d != '.git']
+            for file_name in file_names:
+                full_path = os.path.join(dir_path, file_name)
+                try:
+                    size = os.path.getsize(full_path)
+                except OSError:
+                    continue
+                relative_path = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                files.append(FileEntry(relative_path, size, None))
+        return files
+
+    def read_bytes(self, path: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.root, path), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def read_text(self, path: str) -> Optional[str]:
+        data = self.read_bytes(path)
+        return data.decode('utf-8', errors='ignore') if data is not None else None
+
+    def close(self):
+        pass
+
+
+class GitObjectSource:
+    """
+    Files of a commit's tree, read straight from the object database.
+
+    Works on bare repositories (e.g. the cached mirrors), so no checkout is written.
+    Tree listing is one `git ls-tree` call; blob contents stream through a single
+    long-lived `git cat-file --batch` process.
+    """
+
+    def __init__(self, repo_path: str, rev: str = 'HEAD'):
+        self.root = None  # There is no working tree to point external tools at
+        self.repo_path = repo_path
+        self.commit = subprocess.run(
+            ['git', '-C', repo_path, 'rev-parse', '--verify', f'{rev}^{{commit}}'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        self._entries: Optional[List[FileEntry]] = None
+        self._blob_ids: Dict[str, str] = {}
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def entries(self) -> List[FileEntry]:
+        if self._entries is None:
+            output = subprocess.run(
+                ['git', '-C', self.repo_path, 'ls-tree', '-r', '-l', '-z', self.commit],
+                capture_output=True, check=True
+            ).stdout.decode('utf-8', errors='replace')
+
+            self._entries = []
+            for record in output.split('\0'):
+                if not record:
+                    continue
+                # "<mode> <type> <object> <size>\t<path>"
+                meta, _, path = record.partition('\t')
+                mode, object_type, blob_id, size = meta.split()
+                # Skip submodules (commits) and symlinks, which a checkout wouldn't read as files either
+                if object_type != 'blob' or mode == '120000':
+                    continue
+                self._entries.append(FileEntry(path, int(size), blob_id))
+                self._blob_ids[path] = blob_id
+        return self._entries
+
+    def read_blob(self, blob_id: str) -> Optional[bytes]:
+        with self._lock:
+            if self._process is None:
+                self._process = subprocess.Popen(
+                    ['git', '-C', self.repo_path, 'cat-file', '--batch'],
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE
+                )
+            self._process.stdin.write(f'{blob_id}\n'.encode('ascii'))
+            self._process.stdin.flush()
+
+            # "<object> blob <size>\n<content>\n" or "<object> missing\n"
+            header = self._process.stdout.readline().split()
+            if len(header) != 3:
+                return None
+            data = self._process.stdout.read(int(header[2]))
+            self._process.stdout.read(1)
+            return data
+
+    def read_bytes(self, path: str) -> Optional[bytes]:
+        if self._entries is None:
+            self.entries()
+        blob_id = self._blob_ids.get(path)
+        return self.read_blob(blob_id) if blob_id else None
+
+    def read_text(self, path: str) -> Optional[str]:
+        data = self.read_bytes(path)
+        return data.decode('utf-8', errors='ignore') if data is not None else None
+
+    def close(self):
+        with self._lock:
+            if self._process is not None:
+                self._process.stdin.close()
+                self._process.wait()
+                self._process.stdout.close()
+                self._process = None
+
+
+def is_bare_repository(repo_path: str) -> bool:
+    return subprocess.run(
+        ['git', '-C', repo_path, 'rev-parse', '--is-bare-repository'],
+        capture_output=True, text=True, check=False
+    ).stdout.strip() == 'true'
+
+
+def open_source(repo_path: str):
+    """Picks the object-database backend for bare repositories, the working tree otherwise."""
+    if is_bare_repository(repo_path):
+        return GitObjectSource(repo_path)
+    return WorkingTreeSource(repo_path)
+
+
+def materialize(source, paths: List[str], dest_dir: str) -> str:
+    """Writes the given files into dest_dir (for external tools that need real files)."""
+    for path in paths:
+        data = source.read_bytes(path)
+        if data is None:
+            continue
+        target = os.path.join(dest_dir, *path.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+    return dest_dir
@@ -9,6 +9,16 @@ import stat
 import datetime 
 import re # Needed for print_table's width calculation logic
 
+from repo_source import open_source
+from hotspot_index import select_hotspots
+from keyword_automaton import KeywordAutomaton
+
+# Rows in the 'Most Complex Functions' table
+HOTSPOT_REPORT_LIMIT = 50
+
+# Rows in the 'Knowledge Concentration' table
+BUS_FACTOR_REPORT_LIMIT = 50
+
 # --- PDF Imports ---
 
 
@@ -19,55 +29,60 @@ import os
 
 # --- FEATURE: KEYWORD SECURITY SCANNER (TABLE 9) ---
 
-def security_keyword_scan(scan_directory: str) -> Tuple[List[List[Any]], int]:
+# Target keywords as explicitly requested by the user; compiled once into a single automaton,
+# so the list can grow without adding passes over the files
+SECURITY_KEYWORDS = ["api", "apikey", "api key"]
+SECURITY_KEYWORD_AUTOMATON = KeywordAutomaton(SECURITY_KEYWORDS)
+
+def security_keyword_scan(scan_directory: str, source=None) -> Tuple[List[List[Any]], int]:
     """
-    Scans files in the target directory specifically for the keywords: 
+    Scans files in the target directory specifically for the SECURITY_KEYWORDS:
     'api', 'apikey', and 'api key' (case-insensitive).
     
+    Files are read through `source` (see repo_source); by default the working tree of
+    scan_directory, or its object database if it is a bare repository. Each file's raw
+    bytes go through SECURITY_KEYWORD_AUTOMATON once; each occurrence counts once, under
+    the longest keyword it matches ('apikey' is not also an 'api').
     It returns a list of [File Path, Total Matches] and the grand total count.
     """
     
-    # Target keywords as explicitly requested by the user
-    TARGET_KEYWORDS = ["api", "apikey", "api key"]
     SKIP_EXTENSIONS = ('.jpg', '.png', '.gif', '.zip', '.exe', '.dll', '.bin', '.pdf', '.lock', '.min.js', '.ico')
     
     file_findings: List[List[Any]] = []
     total_findings_count = 0 
 
-    if not scan_directory or scan_directory.startswith('http') or not os.path.isdir(scan_directory):
-        # Return empty data if the path is invalid
-        return [], 0
+    owns_source = source is None
+    if owns_source:
+        if not scan_directory or scan_directory.startswith('http') or not os.path.isdir(scan_directory):
+            # Return empty data if the path is invalid
+            return [], 0
+        source = open_source(scan_directory)
     
     print(f"\nScanning local directory: {os.path.basename(scan_directory)} for specific security keywords...")
 
-    for root, dirnames, files in os.walk(scan_directory):
-        # Skip hidden directories
-        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
-            
-        for file_name in files:
+    try:
+        for entry in source.entries():
+            path_parts = entry.path.split('/')
+
+            # Skip hidden directories
+            if any(part.startswith('.') for part in path_parts[:-1]):
+                continue
+
             # Skip binary and minified files
-            if file_name.lower().endswith(SKIP_EXTENSIONS):
+            if path_parts[-1].lower().endswith(SKIP_EXTENSIONS):
                 continue
-            
-            file_path = os.path.join(root, file_name)
-            relative_path = os.path.relpath(file_path, scan_directory)
-            
-            api_count = 0
-            
-            try:
-                # Skip files larger than 1MB
-                if os.path.getsize(file_path) > 1024 * 1024: 
-                    continue
-                    
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read().lower()
-                    
-                    for keyword in TARGET_KEYWORDS:
-                        api_count += content.count(keyword) 
-                        
-            except Exception:
+
+            # Skip files larger than 1MB
+            if entry.size > 1024 * 1024:
+                continue
+
+            relative_path = entry.path.replace('/', os.sep)
+            content = source.read_bytes(entry.path)
+            if content is None:
                 # Skip files that cannot be read
-                continue 
+                continue
+
+            api_count = SECURITY_KEYWORD_AUTOMATON.total(content)
             
             if api_count > 0:
                 # Return format: [file_path, total_api_matches]
@@ -77,6 +92,9 @@ def security_keyword_scan(scan_directory: str) -> Tuple[List[List[Any]], int]:
                 ])
 
             total_findings_count += api_count
+    finally:
+        if owns_source:
+            source.close()
             
     print(f"Security scan finished: {total_findings_count} potential issues found.")
     return file_findings, total_findings_count
@@ -114,11 +132,19 @@ def find_main_contributing_factor(data: Dict[str, Any], max_values: Dict[str, fl
 
     norm_complexity = normalize_metric(data.get('complexity', 1), max_values.get('complexity', 1))
     norm_churn = normalize_metric(data.get('lines_added', 0) + data.get('lines_removed', 0), max_values.get('total_churn', 1))
+    recency_weight = max_values.get('recency_weight', 0)
+    if recency_weight:
+        norm_recent_churn = normalize_metric(data.get('decayed_churn', 0.0), max_values.get('decayed_churn', 1))
+        norm_churn = norm_churn * (1 - recency_weight) + norm_recent_churn * recency_weight
     norm_entropy = normalize_metric(data.get('ownership_entropy', 0.0), max_values.get('ownership_entropy', 1))
     
     total_commits = data.get('commit_count', 0)
     bug_fix_freq = data.get('bug_fix_count', 0) / (total_commits or 1)
     norm_bug_freq = normalize_metric(bug_fix_freq, max_values.get('bug_fix_freq', 1))
+    if recency_weight:
+        recent_bug_fix_freq = data.get('decayed_bug_fixes', 0.0) / (data.get('decayed_commits', 0.0) or 1)
+        norm_recent_bug_freq = normalize_metric(recent_bug_fix_freq, max_values.get('recent_bug_fix_freq', 1))
+        norm_bug_freq = norm_bug_freq * (1 - recency_weight) + norm_recent_bug_freq * recency_weight
     
     dependency_score = data.get('fan_in', 0) * 2 + data.get('fan_out', 0) * 1
     norm_dependency = normalize_metric(dependency_score, max_values.get('dependency_score', 1))
@@ -193,6 +219,7 @@ def generate_cli_report(repo_url: str, all_file_data: Dict[str, Dict[str, Any]])
     contributor_data = all_file_data.pop('_contributor_stats', {})
     repo_metadata = all_file_data.pop('_repo_metadata', {}) 
     temp_local_path = all_file_data.pop('_local_repo_path', repo_url) 
+    hotspots = all_file_data.pop('_hotspots', [])
 
     repo_score = repo_stats.get('overall_technical_debt', 0)
     max_values = repo_stats.get('max_values', {})
@@ -428,7 +455,7 @@ def generate_cli_report(repo_url: str, all_file_data: Dict[str, Dict[str, Any]])
         # Convert counts to strings for table printing
         security_table_data = [[item[0], str(item[1])] for item in security_data]
 
-        print(f"\n> Description: Files containing explicit API key keywords ('api', 'apikey', 'api key'). Potential security hotspots.")
+        print(f"\n> Description: Files containing explicit API key keywords ('api', 'apikey', 'api key'; each occurrence counted once, as its longest keyword). Potential security hotspots.")
         headers = ["File Path", "Keyword Matches (n)"]
         
         # FIX APPLIED: Corrected variable name from security_data_parsed to security_data and updated number to 9.
@@ -440,6 +467,46 @@ def generate_cli_report(repo_url: str, all_file_data: Dict[str, Dict[str, Any]])
         print(f"\n❌ Error printing Security Hotspot Table (9): {e}", file=sys.stderr)
 
 
+    # ------------------------------------------------------------------
+    # --- 10. Table: Most Complex Functions (from the hotspot index) ---
+    # ------------------------------------------------------------------
+    function_hotspots = select_hotspots(hotspots, limit=HOTSPOT_REPORT_LIMIT, kind='function')
+    hotspot_table = [
+        [h['path'], h['name'], f"{h['start_line']}-{h['end_line']}", str(h['complexity']), str(h['loc'])]
+        for h in function_hotspots
+    ]
+
+    print(f"\n> Description: The individual functions with the highest Cyclomatic Complexity across the repository. Smallest units to refactor first.")
+    print_table(f"10. Most Complex Functions (Top {len(hotspot_table)})", 
+                ["File Path", "Function", "Lines", "CC", "LOC"], 
+                hotspot_table)
+
+
+    # ------------------------------------------------------------------
+    # --- 11. Table: Knowledge Concentration (Bus Factor) ---
+    # ------------------------------------------------------------------
+    # Lowest bus factor first; among equals, the riskier file first. Files without history are skipped.
+    bus_factor_list = sorted(
+        (item for item in file_list if item[1].get('bus_factor', 0) > 0),
+        key=lambda x: (x[1]['bus_factor'], -x[1].get('risk_score', 0))
+    )[:BUS_FACTOR_REPORT_LIMIT]
+    bus_factor_table = [
+        [
+            path,
+            str(data['bus_factor']),
+            f"{data.get('ownership_entropy', 0.0):.2f}",
+            str(data.get('unique_author_count', 0)),
+            f"{data.get('risk_score', 0):.2f}"
+        ]
+        for path, data in bus_factor_list
+    ]
+
+    print(f"\n> Description: Files whose knowledge sits with the fewest people. Bus Factor = minimum authors covering 50% of commits; Ownership Entropy runs from 0 (single owner) to 1 (evenly shared).")
+    print_table(f"11. Knowledge Concentration (Bus Factor) ({len(bus_factor_table)} Files)", 
+                ["File Path", "Bus Factor", "Ownership Entropy", "Authors", "Risk Score"], 
+                bus_factor_table)
+
+
     # --- FINAL FOOTER ---
     
     plain_repo_score = f"{repo_score:.2f}"
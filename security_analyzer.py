@@ -6,6 +6,9 @@
 # and requires them to be installed and available in the system PATH.
 
 import argparse
+import asyncio
+import hashlib
+import heapq
 import os
 import shutil
 import tempfile
@@ -13,9 +16,17 @@ import subprocess
 import json
 import re
 import sys
-from typing import Dict, Any, List, Tuple
+import time
+from bisect import bisect_right
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 from colorama import init, Fore, Style # Import colorama for styling
 
+from blob_cache import list_blob_ids, open_blob_cache, get_cached, put_cached
+from repo_source import open_source, materialize
+from git_history_analyzer import HISTORY_SHARDS, list_commit_shards
+
 # Initialize Colorama for cross-platform compatibility
 init(autoreset=True)
 
@@ -23,6 +34,14 @@ init(autoreset=True)
 TOOL_VERSION = "v1.0.0-color-release"
 MAX_PENALTY_SCORE = 100 # Used for normalizing the Risk Score (Feature 7)
 
+# Time limit per tool in seconds (GITDEBT_SECURITY_TOOL_TIMEOUT, or e.g. GITDEBT_BANDIT_TIMEOUT for one tool).
+# The tools run concurrently; one that runs over is reported as timed out and the others' findings are kept.
+SECURITY_TOOL_TIMEOUT = int(os.environ.get('GITDEBT_SECURITY_TOOL_TIMEOUT', '600'))
+TOOL_TIMEOUTS: Dict[str, int] = {
+    tool: int(os.environ.get(f'GITDEBT_{tool.upper()}_TIMEOUT', SECURITY_TOOL_TIMEOUT))
+    for tool in ('Secrets', 'History', 'Bandit', 'Safety')
+}
+
 # --- Feature 7: Scoring Weights ---
 SEVERITY_WEIGHTS: Dict[str, int] = {
     'HIGH': 10,
@@ -52,6 +71,66 @@ SECRET_PATTERNS: Dict[str, str] = {
     "API_KEY": r"(api|client|access)[._]key\s*:\s*([a-z0-9]{32,64})"
 }
 
+# Line breaks of a file read in text mode ('\n', '\r', '\r\n'; form feeds and the like are not),
+# as a regex class body, so line numbers match `for line in f`; a secret never spans lines
+LINE_BREAK_CLASS = r"\n\r"
+LINE_BREAK_REGEX = re.compile(rf"\r\n|[{LINE_BREAK_CLASS}]")
+
+
+def confine_to_line(pattern_regex: str) -> str:
+    """Rewrites a per-line pattern so it cannot match across line breaks when run over a whole file."""
+    pattern_regex = pattern_regex.replace("[^", f"[^{LINE_BREAK_CLASS}")
+    return pattern_regex.replace(r"\s", rf"[^\S{LINE_BREAK_CLASS}]")
+
+
+def lowercase_pattern(pattern_regex: str) -> str:
+    """Lower-cases a pattern's literal letters (escapes like \\S are kept) for matching lower-cased text."""
+    return re.sub(r"(\\.)|([A-Z])", lambda m: m.group(1) or m.group(2).lower(), pattern_regex)
+
+
+# Secret patterns compiled once, each run over whole file buffers. ASCII files (the vast majority)
+# are lower-cased once and scanned without IGNORECASE, which lets the regex engine skip ahead to
+# each pattern's leading literals instead of trying every position; other files use IGNORECASE.
+SECRET_PATTERN_REGEXES: Dict[str, "re.Pattern"] = {
+    name: re.compile(confine_to_line(regex), re.IGNORECASE) for name, regex in SECRET_PATTERNS.items()
+}
+ASCII_SECRET_PATTERN_REGEXES: Dict[str, "re.Pattern"] = {
+    name: re.compile(lowercase_pattern(confine_to_line(regex))) for name, regex in SECRET_PATTERNS.items()
+}
+
+# --- Bandit sharding and caching ---
+# Python files are split into byte-balanced shards, one bandit process each, at most BANDIT_WORKERS at once.
+# Trees smaller than BANDIT_MIN_SHARD_BYTES per worker use fewer shards (a single one for small repos).
+BANDIT_WORKERS = int(os.environ.get('GITDEBT_BANDIT_WORKERS', os.cpu_count() or 1))
+BANDIT_MIN_SHARD_BYTES = 1024 * 1024
+# Files per bandit command line, to stay under the OS argument length limit
+BANDIT_MAX_FILES_PER_RUN = 2000
+# What `bandit -r` picks up, and the directories it skips by default
+BANDIT_EXTENSIONS = ('.py', '.pyw')
+BANDIT_EXCLUDE_DIRS = ('.svn', 'CVS', '.bzr', '.hg', '.git', '__pycache__', '.tox', '.eggs')
+# The scanned repo's own Bandit configuration: `bandit -r` reads '.bandit' (INI) by itself,
+# '[tool.bandit]' in pyproject.toml only with -c. Both are passed explicitly (see bandit_config).
+BANDIT_INI_FILE = '.bandit'
+BANDIT_PYPROJECT_FILE = 'pyproject.toml'
+# Per-file Bandit findings are cached by git blob id (namespace "bandit:<bandit version>[:<config hash>]")
+USE_BLOB_CACHE = os.environ.get('GITDEBT_BLOB_CACHE_ENABLED', '1') != '0'
+
+# --- Feature 5: Secrets in Git History ---
+# Set GITDEBT_SECRET_HISTORY_SCAN=0 to skip it; shards follow GITDEBT_HISTORY_SHARDS
+SECRET_HISTORY_SCAN = os.environ.get('GITDEBT_SECRET_HISTORY_SCAN', '1') != '0'
+HISTORY_SCAN_COMMIT_START = '\x1e'
+HISTORY_SCAN_FORMAT = '%x1e%H%x1f%ae'
+# Diff lines read between timeout checks, so one huge commit or file cannot overrun the History timeout
+HISTORY_DEADLINE_CHECK_LINES = 1000
+# "@@ -a,b +c,d @@", or "@@@ -a,b -c,d +e,f @@@" (one '-' range per parent) in merge commits' combined diffs
+HUNK_HEADER_REGEX = re.compile(r"^(@@+) (?:-\d+(?:,\d+)? )+\+(\d+)(?:,\d+)? @@+")
+# Escapes git uses in C-quoted paths ("a\tb.py"); octal escapes are raw bytes of a UTF-8 path
+C_QUOTE_ESCAPES = {'a': 7, 'b': 8, 't': 9, 'n': 10, 'v': 11, 'f': 12, 'r': 13, '"': 34, '\\': 92}
+
+# Directories and file types covered by the secrets scan (Feature 1)
+SECRET_SCAN_SKIP_DIRS = ('.git', 'venv', 'node_modules', '__pycache__')
+SECRET_SCAN_EXTENSIONS = ('.py', '.json', '.yaml', '.yml', '.env', '.sh', '.conf', '.txt', '.html', '.js', '.ts', '.java', '.go', '.c', '.h')
+
 # --- Utility Functions ---
 
 def print_colored(message: str, color_key: str):
@@ -67,42 +146,94 @@ def clean_up(path: str):
     except OSError as e:
         print_colored(f"[ERROR] Error cleaning up {path}: {e}", 'ERROR')
 
+def check_tool_result(tool_name: str, returncode: int, stderr: str) -> bool:
+    """False (after reporting it) if an external tool's exit code means it failed rather than found issues."""
+    # Bandit returns 0 for clean, 1 for issues found, but 2 for error
+    # Safety returns 0 for clean, 1 for issues found
+    if returncode not in [0, 1] and tool_name in ('Bandit', 'Safety'):
+        print_colored(f"[{tool_name}] Execution failed (Code {returncode}). Stderr: {stderr.strip()}", 'ERROR')
+        return False
+    return True
+
 def run_external_tool(cmd: List[str], tool_name: str, target_path: str = None) -> Tuple[bool, str]:
     """Helper function to run external security tools."""
     print_colored(f"[{tool_name}] Running {tool_name}...", 'NORMAL')
+    timeout = TOOL_TIMEOUTS.get(tool_name, SECURITY_TOOL_TIMEOUT)
     try:
         # Popen allows for better control, but run is simpler for synchronous CLI tools
         result = subprocess.run(
             cmd,
-            capture_output=True, text=True, check=False, timeout=600 # 10 minute timeout
+            capture_output=True, text=True, check=False, timeout=timeout
         )
-        # Bandit returns 0 for clean, 1 for issues found, but 2 for error
-        if result.returncode not in [0, 1] and tool_name == 'Bandit':
-             print_colored(f"[{tool_name}] Execution failed (Code {result.returncode}). Stderr: {result.stderr.strip()}", 'ERROR')
-             return False, ""
-        
-        # Safety returns 0 for clean, 1 for issues found
-        if result.returncode not in [0, 1] and tool_name == 'Safety':
-             print_colored(f"[{tool_name}] Execution failed (Code {result.returncode}). Stderr: {result.stderr.strip()}", 'ERROR')
-             return False, ""
+        if not check_tool_result(tool_name, result.returncode, result.stderr):
+            return False, ""
 
         return True, result.stdout
     except FileNotFoundError:
         print_colored(f"[FATAL ERROR] '{cmd[0]}' command not found. Please ensure {tool_name} is installed and in PATH.", 'ERROR')
         return False, ""
     except subprocess.TimeoutExpired:
-        print_colored(f"[{tool_name}] Execution timed out after 600 seconds.", 'ERROR')
+        print_colored(f"[{tool_name}] Execution timed out after {timeout} seconds.", 'ERROR')
         return False, ""
     except Exception as e:
         print_colored(f"[ERROR] {tool_name} scan failed: {e}", 'ERROR')
         return False, ""
 
-def run_bandit(target_path: str) -> List[Dict[str, Any]]:
-    """Feature 3, 4, 6: Runs Bandit SAST tool."""
-    success, output = run_external_tool(['bandit', '-r', target_path, '-f', 'json', '-n', '3', '-q'], 'Bandit')
-    
+async def run_external_tool_async(cmd: List[str], tool_name: str, timeout: Optional[float] = None,
+                                  quiet: bool = False) -> Tuple[bool, str]:
+    """run_external_tool as an asyncio subprocess, so several tools can run at once; killed at its TOOL_TIMEOUTS limit."""
+    if not quiet:
+        print_colored(f"[{tool_name}] Running {tool_name}...", 'NORMAL')
+    timeout = TOOL_TIMEOUTS.get(tool_name, SECURITY_TOOL_TIMEOUT) if timeout is None else timeout
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+    except FileNotFoundError:
+        print_colored(f"[FATAL ERROR] '{cmd[0]}' command not found. Please ensure {tool_name} is installed and in PATH.", 'ERROR')
+        return False, ""
+
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        print_colored(f"[{tool_name}] Execution timed out after {timeout:.0f} seconds; reporting the other findings.", 'ERROR')
+        return False, ""
+
+    if not check_tool_result(tool_name, proc.returncode, stderr.decode('utf-8', errors='replace')):
+        return False, ""
+    return True, stdout.decode('utf-8', errors='replace')
+
+def bandit_config(target_path: str) -> Tuple[List[str], str]:
+    """
+    Bandit options that apply target_path's own configuration, plus a hash of that configuration
+    ('' if there is none). The INI file carries excludes and skips that bandit only reads by
+    itself in recursive mode, so sharded runs over explicit file lists need it passed as --ini.
+    """
+    args: List[str] = []
+    digest = hashlib.sha256()
+    ini_path = os.path.join(target_path, BANDIT_INI_FILE)
+    if os.path.isfile(ini_path):
+        args += ['--ini', ini_path]
+        with open(ini_path, 'rb') as f:
+            digest.update(b'ini\0' + f.read() + b'\0')
+    pyproject_path = os.path.join(target_path, BANDIT_PYPROJECT_FILE)
+    if os.path.isfile(pyproject_path):
+        with open(pyproject_path, 'rb') as f:
+            pyproject = f.read()
+        if re.search(rb'^\s*\[tool\.bandit[\].]', pyproject, re.MULTILINE):
+            args += ['-c', pyproject_path]
+            digest.update(b'pyproject\0' + pyproject + b'\0')
+    return args, digest.hexdigest()[:16] if args else ''
+
+def bandit_command(target_path: str) -> List[str]:
+    return ['bandit', '-r', target_path, '-f', 'json', '-n', '3', '-q', *bandit_config(target_path)[0]]
+
+def parse_bandit_output(output: str, target_path: str) -> List[Dict[str, Any]]:
+    """Maps Bandit's JSON report to our standard finding format (paths relative to target_path)."""
     findings: List[Dict[str, Any]] = []
-    if success and output:
+    if output:
         try:
             bandit_results = json.loads(output)
             if 'results' in bandit_results:
@@ -122,128 +253,568 @@ def run_bandit(target_path: str) -> List[Dict[str, Any]]:
     
     return findings
 
+def run_bandit(target_path: str) -> List[Dict[str, Any]]:
+    """Feature 3, 4, 6: Runs Bandit SAST tool."""
+    success, output = run_external_tool(bandit_command(target_path), 'Bandit')
+    return parse_bandit_output(output, target_path) if success else []
+
+def bandit_shard_command(paths: List[str], config_args: List[str]) -> List[str]:
+    return ['bandit', '-f', 'json', '-n', '3', '-q', *config_args, *paths]
+
+async def get_bandit_version() -> Optional[str]:
+    """Installed bandit version (e.g. '1.7.9'), or None if bandit cannot be run."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            'bandit', '--version', stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+    except FileNotFoundError:
+        return None
+    stdout, _ = await proc.communicate()
+    fields = stdout.decode('utf-8', errors='replace').split()
+    return fields[1] if proc.returncode == 0 and len(fields) > 1 else None
+
+def balance_shards(sizes: Dict[str, int], shards: int) -> List[List[str]]:
+    """Splits paths into up to `shards` groups of roughly equal total size (largest file first, into the lightest group)."""
+    heap = [(0, shard) for shard in range(max(1, shards))]
+    groups: List[List[str]] = [[] for _ in heap]
+    for path in sorted(sizes, key=lambda p: (-sizes[p], p)):
+        total, shard = heapq.heappop(heap)
+        groups[shard].append(path)
+        heapq.heappush(heap, (total + sizes[path], shard))
+    return [sorted(group) for group in groups if group]
+
+async def run_bandit_async(target_path: str, source=None) -> List[Dict[str, Any]]:
+    """
+    Feature 3, 4, 6: Bandit over target_path's Python files, in parallel shards.
+
+    Files are listed through `source` (default: target_path's working tree) and those whose
+    git blob was scanned before by the same bandit version are served from the shared blob
+    cache; the repo's Bandit configuration (see bandit_config) is applied to every shard and
+    is part of the cache key. The rest are split into byte-balanced shards, one `bandit` process per shard and
+    at most BANDIT_WORKERS at a time. Shard reports are merged into the standard finding format
+    with paths relative to target_path. Shards cut off by the Bandit timeout are left out (and
+    not cached); the findings of the finished ones are kept.
+    """
+    print_colored("[Bandit] Running Bandit...", 'NORMAL')
+    version = await get_bandit_version()
+    if version is None:
+        print_colored("[FATAL ERROR] 'bandit' command not found. Please ensure Bandit is installed and in PATH.", 'ERROR')
+        return []
+
+    owns_source = source is None
+    if owns_source:
+        source = open_source(target_path)
+    try:
+        entries = [
+            entry for entry in source.entries()
+            if entry.path.endswith(BANDIT_EXTENSIONS)
+            and not any(part in BANDIT_EXCLUDE_DIRS or part.endswith('.egg') for part in entry.path.split('/')[:-1])
+        ]
+    finally:
+        if owns_source:
+            source.close()
+
+    # Cache lookup by blob id; untracked files (no blob id) are always scanned
+    relative_paths = {entry.path: entry.path.replace('/', os.sep) for entry in entries}
+    cache_conn = open_blob_cache() if USE_BLOB_CACHE else None
+    config_args, config_hash = bandit_config(target_path)
+    namespace = f"bandit:{version}:{config_hash}" if config_hash else f"bandit:{version}"
+    blob_ids: Dict[str, str] = {}
+    cached: Dict[str, Any] = {}
+    if cache_conn is not None:
+        blob_ids = {entry.path: entry.blob_id for entry in entries if entry.blob_id}
+        if not blob_ids and source.root is not None:
+            blob_ids = list_blob_ids(source.root)
+        cached = get_cached(cache_conn, namespace, {blob_ids[e.path] for e in entries if e.path in blob_ids})
+
+    findings: List[Dict[str, Any]] = []
+    misses: Dict[str, int] = {}
+    for entry in entries:
+        blob_id = blob_ids.get(entry.path)
+        if blob_id in cached:
+            findings.extend({**finding, "file": relative_paths[entry.path]} for finding in cached[blob_id])
+        else:
+            misses[entry.path] = entry.size
+
+    total_bytes = sum(misses.values())
+    shards = balance_shards(misses, min(BANDIT_WORKERS, max(1, total_bytes // BANDIT_MIN_SHARD_BYTES)))
+    deadline = time.monotonic() + TOOL_TIMEOUTS['Bandit']
+    if len(shards) > 1:
+        print_colored(f"[Bandit] Scanning {len(misses)} files ({total_bytes / 1024 / 1024:.1f} MB) in {len(shards)} parallel shards...", 'NORMAL')
+
+    async def scan_shard(paths: List[str]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Runs one shard (in command-line sized chunks); returns the files it finished and their findings."""
+        done: List[str] = []
+        shard_findings: List[Dict[str, Any]] = []
+        for start in range(0, len(paths), BANDIT_MAX_FILES_PER_RUN):
+            chunk = paths[start:start + BANDIT_MAX_FILES_PER_RUN]
+            success, output = await run_external_tool_async(
+                bandit_shard_command([os.path.join(target_path, *path.split('/')) for path in chunk], config_args),
+                'Bandit', timeout=max(0.0, deadline - time.monotonic()), quiet=True
+            )
+            if not success:
+                break
+            done.extend(chunk)
+            shard_findings.extend(parse_bandit_output(output, target_path))
+        return done, shard_findings
+
+    scanned: List[str] = []
+    for done, shard_findings in await asyncio.gather(*(scan_shard(shard) for shard in shards)):
+        scanned.extend(done)
+        findings.extend(shard_findings)
+
+    if cache_conn is not None:
+        # Stored with the path they were found under; it is replaced by the current path on a hit
+        by_file: Dict[str, List[Dict[str, Any]]] = {}
+        for finding in findings:
+            by_file.setdefault(finding['file'], []).append(finding)
+        put_cached(cache_conn, namespace, [
+            (blob_ids[path], by_file.get(relative_paths[path], []))
+            for path in scanned if path in blob_ids
+        ])
+        cache_conn.close()
+        print_colored(f"[Bandit] Cache: {len(entries) - len(misses)} hits, {len(misses)} misses.", 'NORMAL')
+
+    return findings
+
+# Safety primarily checks this file
+SAFETY_REQUIREMENT_FILES = ['requirements.txt']
+
+def safety_command(full_path: str) -> List[str]:
+    return ['safety', 'check', '-r', full_path, '--json']
+
+def parse_safety_output(output: str, req_file: str) -> List[Dict[str, Any]]:
+    """Maps Safety's JSON report for one requirements file to our standard finding format."""
+    found_vulnerabilities = []
+    if output:
+        try:
+            safety_results = json.loads(output)
+            for finding in safety_results:
+                # Ensure finding structure is as expected from Safety's JSON output
+                if isinstance(finding, dict) and 'package' in finding:
+                    found_vulnerabilities.append({
+                        "code": "DEP-001",
+                        "severity": "HIGH",
+                        "msg": f"Vulnerable dependency: {finding['package']}@{finding['installed_version']}. ID: {finding.get('id', 'N/A')}",
+                        "cwe": finding.get('cve', 'N/A'),
+                        "file": req_file,
+                        "line": 0,
+                        "remediation": f"Upgrade to {finding['secure_versions']} or later."
+                    })
+        except json.JSONDecodeError:
+            print_colored("[ERROR] Failed to parse Safety JSON output.", 'ERROR')
+
+    return found_vulnerabilities
+
 def run_safety(target_path: str) -> List[Dict[str, Any]]:
     """Feature 2: Runs Safety tool on requirements files."""
-    req_files = ['requirements.txt'] # Safety primarily checks this file
     found_vulnerabilities = []
 
-    for req_file in req_files:
+    for req_file in SAFETY_REQUIREMENT_FILES:
         full_path = os.path.join(target_path, req_file)
         if os.path.exists(full_path):
-            success, output = run_external_tool(['safety', 'check', '-r', full_path, '--json'], 'Safety')
-            
-            if success and output:
-                try:
-                    safety_results = json.loads(output)
-                    for finding in safety_results:
-                        # Ensure finding structure is as expected from Safety's JSON output
-                        if isinstance(finding, dict) and 'package' in finding:
-                            found_vulnerabilities.append({
-                                "code": "DEP-001",
-                                "severity": "HIGH",
-                                "msg": f"Vulnerable dependency: {finding['package']}@{finding['installed_version']}. ID: {finding.get('id', 'N/A')}",
-                                "cwe": finding.get('cve', 'N/A'),
-                                "file": req_file,
-                                "line": 0,
-                                "remediation": f"Upgrade to {finding['secure_versions']} or later."
-                            })
-                except json.JSONDecodeError:
-                    print_colored("[ERROR] Failed to parse Safety JSON output.", 'ERROR')
+            success, output = run_external_tool(safety_command(full_path), 'Safety')
+            if success:
+                found_vulnerabilities.extend(parse_safety_output(output, req_file))
 
     return found_vulnerabilities
 
-def scan_for_secrets(target_path: str) -> List[Dict[str, Any]]:
-    """Feature 1: Basic file content scan for hardcoded secrets."""
+async def run_safety_async(target_path: str) -> List[Dict[str, Any]]:
+    found_vulnerabilities = []
+    for req_file in SAFETY_REQUIREMENT_FILES:
+        full_path = os.path.join(target_path, req_file)
+        if os.path.exists(full_path):
+            success, output = await run_external_tool_async(safety_command(full_path), 'Safety')
+            if success:
+                found_vulnerabilities.extend(parse_safety_output(output, req_file))
+    return found_vulnerabilities
+
+def find_secret_lines(content: str, line_starts: Optional[List[int]] = None) -> List[Tuple[int, str]]:
+    """
+    (line number, pattern name) for every line of `content` matching a SECRET_PATTERNS entry.
+
+    Same result as trying each pattern on each line in turn (first pattern in dict order wins,
+    one finding per line), but each compiled pattern runs once over the whole buffer and line
+    numbers are looked up in a newline offset index, built only for files that have a match.
+    Callers that assembled `content` from known lines can pass their start offsets instead.
+    """
+    if content.isascii():
+        text, regexes = content.lower(), ASCII_SECRET_PATTERN_REGEXES
+    else:
+        text, regexes = content, SECRET_PATTERN_REGEXES
+
+    found: Dict[int, str] = {}
+    line_starts = line_starts or []
+    for pattern_name, regex in regexes.items():
+        for match in regex.finditer(text):
+            if not line_starts:
+                line_starts = [0] + [m.end() for m in LINE_BREAK_REGEX.finditer(text)]
+            # Only report the first match per line for clarity; earlier patterns take precedence
+            found.setdefault(bisect_right(line_starts, match.start()), pattern_name)
+    return sorted(found.items())
+
+def scan_for_secrets(target_path: str, source=None, deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Feature 1: Basic file content scan for hardcoded secrets.
+
+    Files are read through `source` (see repo_source); by default the working tree
+    of target_path, or its object database if it is a bare repository. Past `deadline`
+    (a time.monotonic() value) the scan stops and returns what it found so far.
+    """
     print_colored("[CUSTOM] Scanning files for hardcoded secrets (Feature 1)...", 'NORMAL')
     secrets_found: List[Dict[str, Any]] = []
-    
-    # Simple walk, excluding common directories like .git, venv, node_modules
-    for root, dirs, files in os.walk(target_path):
-        dirs[:] = [d for d in dirs if d not in ['.git', 'venv', 'node_modules', '__pycache__']]
-        
-        for file in files:
-            # Check common file types for secrets
-            if not file.endswith(('.py', '.json', '.yaml', '.yml', '.env', '.sh', '.conf', '.txt', '.html', '.js', '.ts', '.java', '.go', '.c', '.h')):
+    owns_source = source is None
+    if owns_source:
+        source = open_source(target_path)
+
+    try:
+        for entry in source.entries():
+            if deadline is not None and time.monotonic() > deadline:
+                print_colored("[CUSTOM] Secrets scan timed out; reporting partial results.", 'WARNING')
+                break
+
+            # Exclude common directories like .git, venv, node_modules
+            if any(part in SECRET_SCAN_SKIP_DIRS for part in entry.path.split('/')[:-1]):
                 continue
 
-            full_path = os.path.join(root, file)
-            relative_path = os.path.relpath(full_path, target_path)
-
-            try:
-                with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    for i, line in enumerate(f, 1):
-                        for pattern_name, pattern_regex in SECRET_PATTERNS.items():
-                            if re.search(pattern_regex, line, re.IGNORECASE | re.MULTILINE):
-                                # Only report the first match per line for clarity
-                                secrets_found.append({
-                                    "code": f"SEC-{pattern_name}",
-                                    "severity": "HIGH",
-                                    "msg": f"Possible exposed {pattern_name.replace('_', ' ')}.",
-                                    "cwe": "CWE-798 (Use of Hard-coded Credentials)",
-                                    "file": relative_path,
-                                    "line": i,
-                                    "remediation": "Move secret to a secure environment variable or vault. Consider Git history cleaning."
-                                })
-                                break # Move to next line after finding one secret
-            except Exception:
-                pass # Skip files we cannot read/decode
+            # Check common file types for secrets
+            if not entry.path.endswith(SECRET_SCAN_EXTENSIONS):
+                continue
 
+            relative_path = entry.path.replace('/', os.sep)
+            content = source.read_text(entry.path)
+            if content is None:
+                continue # Skip files we cannot read/decode
+
+            for i, pattern_name in find_secret_lines(content):
+                secrets_found.append({
+                    "code": f"SEC-{pattern_name}",
+                    "severity": "HIGH",
+                    "msg": f"Possible exposed {pattern_name.replace('_', ' ')}.",
+                    "cwe": "CWE-798 (Use of Hard-coded Credentials)",
+                    "file": relative_path,
+                    "line": i,
+                    "remediation": "Move secret to a secure environment variable or vault. Consider Git history cleaning."
+                })
+    finally:
+        if owns_source:
+            source.close()
     return secrets_found
 
+def unquote_git_path(path: str) -> str:
+    """Undoes git's C-style quoting of unusual paths ('"b/q\\tt.py"' -> 'b/q<TAB>t.py'); other paths are returned as is."""
+    if len(path) < 2 or not (path.startswith('"') and path.endswith('"')):
+        return path
+    raw = bytearray()
+    body = path[1:-1]
+    i = 0
+    while i < len(body):
+        char = body[i]
+        if char == '\\' and i + 1 < len(body):
+            escaped = body[i + 1]
+            if escaped in '01234567':
+                raw.append(int(body[i + 1:i + 4], 8) & 0xFF)
+                i += 4
+                continue
+            raw.append(C_QUOTE_ESCAPES.get(escaped, ord(escaped) if escaped.isascii() else 63))
+            i += 2
+            continue
+        raw.extend(char.encode('utf-8'))
+        i += 1
+    return raw.decode('utf-8', errors='replace')
+
+def _scan_added_lines(added_lines: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+    """(line number in the new blob, pattern name) for the secrets in one file's added lines."""
+    line_starts: List[int] = []
+    offset = 0
+    for _, text in added_lines:
+        line_starts.append(offset)
+        offset += len(text) + 1
+    content = '\n'.join(text for _, text in added_lines)
+    return [(added_lines[i - 1][0], pattern_name) for i, pattern_name in find_secret_lines(content, line_starts)]
+
+def _history_finding(pattern_name: str, path: str, line: int, commit: str, author: str) -> Dict[str, Any]:
+    return {
+        "code": f"SEC-HIST-{pattern_name}",
+        "severity": "HIGH",
+        "msg": f"Possible exposed {pattern_name.replace('_', ' ')} added in Git history.",
+        "cwe": "CWE-798 (Use of Hard-coded Credentials)",
+        "file": path.replace('/', os.sep),
+        "line": line,
+        "commit": commit,
+        "author": author,
+        "remediation": "Revoke and rotate the credential: removing it in a later commit leaves it readable in history. Then clean the history (e.g. git filter-repo)."
+    }
+
+def scan_history_shard(repo_path: str, shas: List[str],
+                       timeout: Optional[float] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Streams `git log -p` for the given commits (in that order) and scans the lines they add.
+
+    Only added or modified files are diffed (--diff-filter=AM, renames as additions, no
+    context lines). Merge commits are diffed with --cc, so lines that appear in none of the
+    parents (e.g. typed while resolving a conflict) are scanned too; lines a merge takes
+    from one side were scanned with the commit that added them. Each file version is
+    identified by its blob id, and a blob already seen earlier in the stream is skipped,
+    so every distinct content is scanned once. Returns
+    (blob id, finding) pairs, one finding per matching added line. After `timeout` seconds
+    (checked per file and every HISTORY_DEADLINE_CHECK_LINES lines) the stream is cut off
+    and the findings so far are returned.
+    """
+    # Relative to this process's clock: shards may run in other processes
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    cmd = [
+        'git', '-C', repo_path, '-c', 'core.quotePath=false', 'log', '-p', '--cc', '--no-walk=unsorted', '--stdin',
+        '--diff-filter=AM', '--no-renames', '--unified=0', '--full-index', '--no-color', '--no-ext-diff',
+        f'--format={HISTORY_SCAN_FORMAT}'
+    ]
+    stdin_file = tempfile.TemporaryFile()
+    stdin_file.write(''.join(f'{sha}\n' for sha in shas).encode('ascii'))
+    stdin_file.seek(0)
+    stderr_file = tempfile.TemporaryFile()
+    proc = subprocess.Popen(
+        cmd, stdin=stdin_file, stdout=subprocess.PIPE, stderr=stderr_file,
+        text=True, encoding='utf-8', errors='replace'
+    )
+
+    findings: List[Tuple[str, Dict[str, Any]]] = []
+    seen_blobs = set()
+    commit = author = ''
+    blob: Optional[str] = None
+    path: Optional[str] = None
+    added_lines: List[Tuple[int, str]] = []
+    in_hunk = skip = timed_out = False
+    next_line = 0
+    parents = 1 # Marker columns per hunk line: 1, or one per parent in a combined diff
+
+    def flush():
+        if added_lines and path is not None:
+            for line, pattern_name in _scan_added_lines(added_lines):
+                findings.append((blob, _history_finding(pattern_name, path, line, commit, author)))
+        added_lines.clear()
+
+    try:
+        for line_count, line in enumerate(proc.stdout, 1):
+            if deadline is not None and line_count % HISTORY_DEADLINE_CHECK_LINES == 0 and time.monotonic() > deadline:
+                timed_out = True
+                proc.kill()
+                break
+            line = line.rstrip('\n')
+            if in_hunk and line[:1] in ('+', '-', ' '):
+                markers = line[:parents]
+                if '-' in markers:
+                    continue # Not in the new version
+                if not skip and markers == '+' * parents:
+                    added_lines.append((next_line, line[parents:]))
+                next_line += 1
+            elif line.startswith('@@'):
+                in_hunk = True
+                match = HUNK_HEADER_REGEX.match(line)
+                parents = len(match.group(1)) - 1 if match else 1
+                next_line = int(match.group(2)) if match else 0
+            elif line.startswith(('diff --git ', 'diff --cc ')):
+                flush()
+                if deadline is not None and time.monotonic() > deadline:
+                    timed_out = True
+                    proc.kill()
+                    break
+                blob, path, in_hunk, skip = None, None, False, False
+            elif line.startswith(HISTORY_SCAN_COMMIT_START):
+                flush()
+                if deadline is not None and time.monotonic() > deadline:
+                    timed_out = True
+                    proc.kill()
+                    break
+                commit, _, author = line[1:].partition('\x1f')
+                blob, path, in_hunk, skip = None, None, False, False
+            elif in_hunk:
+                continue # Removed lines and "\ No newline at end of file"
+            elif line.startswith('index '):
+                # "index <old blob>[,<old blob>...]..<new blob>[ <mode>]"
+                blob = line[6:].split(' ', 1)[0].partition('..')[2]
+                skip = blob in seen_blobs
+                seen_blobs.add(blob)
+            elif line.startswith('+++ '):
+                # git appends a TAB to paths containing spaces, and C-quotes unusual ones
+                target = unquote_git_path(line[4:].rstrip('\t'))
+                path = target[2:] if target.startswith('b/') else None
+        flush()
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode('utf-8', errors='replace').strip()
+        stderr_file.close()
+        stdin_file.close()
+
+    if timed_out:
+        print_colored("[HISTORY] History scan timed out; reporting partial results.", 'WARNING')
+    elif returncode != 0:
+        print_colored(f"[HISTORY] git log failed (Code {returncode}). Stderr: {stderr}", 'ERROR')
+    return findings
+
+def scan_git_history_for_secrets(repo_path: str, shards: Optional[int] = None,
+                                 deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Feature 5: Scans every line ever added to the repository's history for hardcoded secrets.
+
+    Commits are split into up to `shards` runs (default HISTORY_SHARDS) scanned by parallel
+    `git log -p` processes, oldest run first. A blob that already produced findings in an
+    older run is not reported again, so each finding points at the earliest commit found
+    to add it, with that commit's SHA and author. Shards stop at `deadline`, a time.monotonic()
+    value (see scan_history_shard).
+    """
+    print_colored("[CUSTOM] Scanning Git history for hardcoded secrets (Feature 5)...", 'NORMAL')
+    try:
+        runs, _ = list_commit_shards(repo_path, 'HEAD', shards or HISTORY_SHARDS)
+    except Exception as e:
+        print_colored(f"[HISTORY] Could not list commits, skipping the history scan: {e}", 'WARNING')
+        return []
+
+    # Oldest commits first, so the first time a blob is seen is when it was introduced
+    runs = [run[::-1] for run in reversed(runs) if run]
+    # Shards get the time left rather than the deadline itself, as monotonic clocks are per process
+    timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+    if len(runs) <= 1:
+        shard_results = [scan_history_shard(repo_path, run, timeout) for run in runs]
+    else:
+        print_colored(f"[HISTORY] Scanning {sum(len(run) for run in runs)} commits in {len(runs)} parallel shards...", 'NORMAL')
+        # Spawned, not forked: this runs in a worker thread next to the asyncio loop and other scans
+        with ProcessPoolExecutor(max_workers=len(runs), mp_context=multiprocessing.get_context('spawn')) as executor:
+            shard_results = list(executor.map(scan_history_shard, [repo_path] * len(runs), runs, [timeout] * len(runs)))
+
+    history_findings: List[Dict[str, Any]] = []
+    reported_blobs = set()
+    for shard_findings in shard_results:
+        shard_blobs = set()
+        for blob, finding in shard_findings:
+            if blob not in reported_blobs:
+                history_findings.append(finding)
+                shard_blobs.add(blob)
+        reported_blobs |= shard_blobs
+    return history_findings
+
+# --- Concurrent tool orchestration ---
+
+async def _run_tool(tool_name: str, scan) -> Tuple[str, List[Dict[str, Any]]]:
+    try:
+        return tool_name, await scan
+    except Exception as e:
+        print_colored(f"[ERROR] {tool_name} scan failed: {e}", 'ERROR')
+        return tool_name, []
+
+async def run_security_tools(scan_path: str, tool_dir: str, source) -> List[Dict[str, Any]]:
+    """
+    Runs every security check at once and merges their findings.
+
+    Bandit and Safety run as asyncio subprocesses; the in-process secret scans run in worker
+    threads and stop at their deadline. Each tool is bounded by its TOOL_TIMEOUTS entry, so a
+    slow tool costs at most its own limit and the others' findings are still reported. Findings
+    are collected as tools finish and returned in a fixed tool order.
+    """
+    loop = asyncio.get_running_loop()
+    now = time.monotonic()
+    scans = {
+        # 1. Exposed Secrets & Credentials (File Content Scan)
+        'Secrets': loop.run_in_executor(None, scan_for_secrets, scan_path, source, now + TOOL_TIMEOUTS['Secrets']),
+        # 2, 3, 4, 6: SAST Analysis (Bandit)
+        # (an exported tool_dir holds the same relative paths, so the source's listing and blob ids still apply)
+        'Bandit': run_bandit_async(tool_dir, source),
+        # 2. Dependency Vulnerabilities (Safety)
+        'Safety': run_safety_async(tool_dir),
+    }
+    # 5. Secrets in Git History
+    if SECRET_HISTORY_SCAN:
+        scans['History'] = loop.run_in_executor(
+            None, scan_git_history_for_secrets, scan_path, None, now + TOOL_TIMEOUTS['History']
+        )
+
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    for finished in asyncio.as_completed([_run_tool(tool_name, scan) for tool_name, scan in scans.items()]):
+        tool_name, findings = await finished
+        results[tool_name] = findings
+        print_colored(f"[{tool_name}] Done: {len(findings)} findings ({time.monotonic() - now:.1f}s).", 'NORMAL')
+
+    return [finding for tool_name in scans for finding in results.get(tool_name, [])]
+
 # --- Core Analyzer Logic ---
 
-def analyze_repo(repo_url: str, return_data: bool = False):
+def analyze_repo(repo_url: str, return_data: bool = False, repo_path: str = None, file_index=None):
     """Clones and executes all security checks.
     
     Args:
         repo_url: GitHub repository URL to analyze
         return_data: If True, returns data dict instead of printing output
+        repo_path: Optional existing checkout of repo_url to scan instead of cloning.
+            The caller owns it, so it is not deleted afterwards.
+        file_index: Optional FileIndex over repo_path shared with other analyses,
+            so files already read by them are not read again.
     
     Returns:
         If return_data=True, returns dict with keys: repo_url, risk_score, severity_counts, findings, tool_version
         Otherwise returns None and prints output
     """
-    try:
-        from git import Repo
-    except ImportError:
-        if return_data:
+    if repo_path:
+        temp_dir = repo_path
+        if not return_data:
+            print_colored(f"\n[INFO] Starting analysis for: {repo_url}", 'NORMAL')
+            print_colored(f"[INFO] Using existing checkout: {temp_dir}", 'NORMAL')
+    else:
+        try:
+            from git import Repo
+        except ImportError:
+            if return_data:
+                return None
+            print_colored("\n[FATAL ERROR] GitPython not found. Please install it (`pip install GitPython`).", 'ERROR')
             return None
-        print_colored("\n[FATAL ERROR] GitPython not found. Please install it (`pip install GitPython`).", 'ERROR')
-        return None
-
-    temp_dir = tempfile.mkdtemp()
-    if not return_data:
-        print_colored(f"\n[INFO] Starting analysis for: {repo_url}", 'NORMAL')
-        print_colored(f"[INFO] Cloning repository into: {temp_dir}", 'NORMAL')
 
-    try:
-        # Clone the repository
-        Repo.clone_from(repo_url, temp_dir)
+        temp_dir = tempfile.mkdtemp()
         if not return_data:
-            print_colored("[INFO] Cloning successful.", 'SUCCESS')
-    except Exception as e:
-        if return_data:
+            print_colored(f"\n[INFO] Starting analysis for: {repo_url}", 'NORMAL')
+            print_colored(f"[INFO] Cloning repository into: {temp_dir}", 'NORMAL')
+
+        try:
+            # Clone the repository
+            Repo.clone_from(repo_url, temp_dir)
+            if not return_data:
+                print_colored("[INFO] Cloning successful.", 'SUCCESS')
+        except Exception as e:
+            if return_data:
+                return None
+            print_colored(f"[FATAL ERROR] Failed to clone repository. Check URL and access rights: {e}", 'ERROR')
+            clean_up(temp_dir)
             return None
-        print_colored(f"[FATAL ERROR] Failed to clone repository. Check URL and access rights: {e}", 'ERROR')
-        clean_up(temp_dir)
-        return None
 
     all_findings: List[Dict[str, Any]] = []
-
-    # 1. Exposed Secrets & Credentials (File Content Scan)
-    all_findings.extend(scan_for_secrets(temp_dir))
-    
-    # 2, 3, 4, 6: SAST Analysis (Bandit)
-    all_findings.extend(run_bandit(temp_dir))
-
-    # 2. Dependency Vulnerabilities (Safety)
-    all_findings.extend(run_safety(temp_dir))
-
-    # --- Feature 5: Secrets in Git History ---
-    # NOTE: True Git History scan requires external tools like Gitleaks/TruffleHog binary.
-    if not return_data:
-        print_colored("[INFO] Skipping full Git History Scan (Feature 5) - Requires separate external binary install.", 'WARNING')
-        print_colored("[INFO] Hardcoded Secrets check (Feature 1) covered current files.", 'WARNING')
+    source = file_index
+    tool_dir = temp_dir
+    try:
+        if source is None:
+            source = open_source(temp_dir)
+
+        # Bandit and Safety need real files: for a bare repository, export just the ones they read
+        if source.root is None:
+            tool_dir = tempfile.mkdtemp(prefix="gitdebt_sec_")
+            materialize(
+                source,
+                [e.path for e in source.entries()
+                 if e.path.endswith(BANDIT_EXTENSIONS) or e.path in (*SAFETY_REQUIREMENT_FILES, BANDIT_INI_FILE, BANDIT_PYPROJECT_FILE)],
+                tool_dir
+            )
+
+        # Features 1-6: file secrets, Git history secrets, Bandit and Safety, all run concurrently
+        if not SECRET_HISTORY_SCAN and not return_data:
+            print_colored("[INFO] Skipping Git History Scan (Feature 5) - disabled by GITDEBT_SECRET_HISTORY_SCAN=0.", 'WARNING')
+            print_colored("[INFO] Hardcoded Secrets check (Feature 1) covered current files.", 'WARNING')
+        all_findings.extend(asyncio.run(run_security_tools(temp_dir, tool_dir, source)))
+    except BaseException:
+        # Our own clone is normally removed after scoring; don't leave it behind on failure either
+        if not repo_path:
+            clean_up(temp_dir)
+        raise
+    finally:
+        if file_index is None and source is not None:
+            source.close()
+        if tool_dir != temp_dir:
+            clean_up(tool_dir)
 
 
     # --- Feature 7: Calculate Overall Security Risk Score ---
@@ -262,8 +833,9 @@ def analyze_repo(repo_url: str, return_data: bool = False):
 
     # --- Return data or display results ---
     if return_data:
-        # Clean up the cloned repository
-        clean_up(temp_dir)
+        # Clean up the cloned repository (shared checkouts belong to the caller)
+        if not repo_path:
+            clean_up(temp_dir)
         return {
             "repo_url": repo_url,
             "risk_score": risk_score,
@@ -275,8 +847,9 @@ def analyze_repo(repo_url: str, return_data: bool = False):
         # --- Display Results ---
         display_output(repo_url, all_findings, severity_counts, risk_score)
         
-        # Clean up the cloned repository
-        clean_up(temp_dir)
+        # Clean up the cloned repository (shared checkouts belong to the caller)
+        if not repo_path:
+            clean_up(temp_dir)
         return None
 
 
@@ -335,6 +908,8 @@ def display_output(repo_url: str, findings: List[Dict[str, Any]], counts: Dict[s
         print_colored(f"**CWE/CVE:** {finding['cwe']}", 'NORMAL')
         print_colored(f"**MESSAGE:** {finding['msg']}", 'NORMAL')
         print_colored(f"**LOCATION:** {finding['file']}:{finding['line']}", 'NORMAL')
+        if finding.get('commit'):
+            print_colored(f"**COMMIT:** {finding['commit']} by {finding.get('author', 'unknown')}", 'NORMAL')
 
         # Feature Mapping (3, 4, 6, 1)
         category = ""
@@ -345,6 +920,8 @@ def display_output(repo_url: str, findings: List[Dict[str, Any]], counts: Dict[s
             category = "Injection Risk Indicators (Feature 4)"
         elif code.startswith('B3') or code.startswith('B4'):
             category = "Insecure Cryptography Usage (Feature 6)"
+        elif code.startswith('SEC-HIST'):
+            category = "Secrets in Git History (Feature 5)"
         elif code.startswith('SEC'):
             category = "Exposed Secrets & Credentials (Feature 1)"
         elif code.startswith('DEP'):
@@ -1,11 +1,31 @@
 import os
 import re
+import io
 import ast
-from typing import Dict, Any, List
+import tokenize
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from blob_cache import list_blob_ids, open_blob_cache, get_cached, put_cached
+from repo_source import open_source
+from file_table import FileTable
 
 # List of file extensions to analyze for complexity and LOC
 ANALYZE_EXTENSIONS = ('.py', '.js', '.ts', '.java', '.c', '.cpp', '.html', '.css')
 
+# Parallel mode: worker count (0/1 = serial) and the repo size below which a pool isn't worth it
+STATIC_ANALYSIS_WORKERS = int(os.environ.get('GITDEBT_STATIC_WORKERS', os.cpu_count() or 1))
+PARALLEL_MIN_FILES = 200
+# Workers are spawned, not forked: the pipeline runs in API and Streamlit threads, and forking beside threads is unsafe
+POOL_CONTEXT = multiprocessing.get_context('spawn')
+# Files read per round when contents come from the git object database instead of disk
+SOURCE_BATCH_FILES = 2000
+
+# Bump whenever analyze_file's output changes so stale blob-cache entries are ignored
+ANALYZER_VERSION = '3'
+USE_BLOB_CACHE = os.environ.get('GITDEBT_BLOB_CACHE_ENABLED', '1') != '0'
+
 COMMENT_PATTERNS = {
     '.py': re.compile(r'^\s*#'),
     '.js': re.compile(r'^\s*//'),
@@ -17,6 +37,17 @@ COMMENT_PATTERNS = {
     # Note: Block comments handled line-by-line below for better accuracy
 }
 
+BLOCK_COMMENT_DELIMITERS = {
+    '.js': ('/*', '*/'),
+    '.ts': ('/*', '*/'),
+    '.java': ('/*', '*/'),
+    '.c': ('/*', '*/'),
+    '.cpp': ('/*', '*/'),
+    '.h': ('/*', '*/'),
+    '.css': ('/*', '*/'),
+    '.html': ('<!--', '-->'),
+}
+
 def calculate_cyclomatic_complexity(node: ast.AST) -> int:
     """Calculates Cyclomatic Complexity for a single AST node."""
     if isinstance(node, (ast.If, ast.While, ast.For, ast.With, ast.ExceptHandler)):
@@ -28,23 +59,141 @@ def calculate_cyclomatic_complexity(node: ast.AST) -> int:
         return len(node.values) - 1
     return 0
 
-def get_cyclomatic_complexity(code: str) -> int:
-    """Calculates Cyclomatic Complexity for the entire code string."""
+class PythonMetricsVisitor(ast.NodeVisitor):
+    """
+    Single AST pass collecting everything static analysis needs from a Python module.
+
+    - complexity: file-level Cyclomatic Complexity (same rules as calculate_cyclomatic_complexity)
+    - symbols: compact [kind, qualified name, start line, end line, complexity, LOC] records
+      (see hotspot_index.SYMBOL_FIELDS). A function's complexity excludes nested functions,
+      which get their own records; a class's is the sum over its methods plus its own body
+    - imports: dotted names of imported modules/objects ('.x' style for relative imports)
+    - docstring_lines: lines taken up by module, class and function docstrings
+    """
+
+    def __init__(self):
+        # The base complexity starts at 1 (for the module itself)
+        self.complexity = 1
+        self.symbols: List[List[Any]] = []
+        self.imports: set = set()
+        self.docstring_lines = 0
+        self._scope: List[str] = []
+        # Innermost enclosing function/class record (None at module level)
+        self._open_symbols: List[Optional[List[Any]]] = [None]
+
+    def visit(self, node: ast.AST):
+        points = calculate_cyclomatic_complexity(node)
+        self.complexity += points
+
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            self._visit_scope(node)
+            return
+
+        if points and self._open_symbols[-1] is not None:
+            self._open_symbols[-1][4] += points
+
+        if isinstance(node, ast.Module):
+            self._count_docstring(node)
+        elif isinstance(node, ast.Import):
+            self.imports.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            prefix = '.' * node.level + (node.module or '')
+            for alias in node.names:
+                if alias.name == '*':
+                    self.imports.add(prefix)
+                elif node.module:
+                    self.imports.add(f"{prefix}.{alias.name}")
+                else:
+                    self.imports.add(f"{prefix}{alias.name}")
+
+        self.generic_visit(node)
+
+    def _visit_scope(self, node: ast.AST):
+        self._count_docstring(node)
+        self._scope.append(node.name)
+
+        is_class = isinstance(node, ast.ClassDef)
+        end_line = getattr(node, 'end_lineno', None) or node.lineno
+        # A function's own complexity starts at 1, like the module's; a class's is accumulated from its methods
+        record = [
+            'class' if is_class else 'function', '.'.join(self._scope),
+            node.lineno, end_line, 0 if is_class else 1, end_line - node.lineno + 1
+        ]
+        self.symbols.append(record)
+
+        self._open_symbols.append(record)
+        self.generic_visit(node)
+        self._open_symbols.pop()
+        self._scope.pop()
+
+        parent = self._open_symbols[-1]
+        if not is_class and parent is not None and parent[0] == 'class':
+            parent[4] += record[4]
+
+    def _count_docstring(self, node: ast.AST):
+        body = getattr(node, 'body', None)
+        if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                and isinstance(body[0].value.value, str):
+            self.docstring_lines += getattr(body[0], 'end_lineno', body[0].lineno) - body[0].lineno + 1
+
+def count_comment_lines(code: str, extension: str) -> int:
+    """Counts comment lines line-by-line: COMMENT_PATTERNS plus BLOCK_COMMENT_DELIMITERS blocks."""
+    pattern = COMMENT_PATTERNS.get(extension)
+    block_start, block_end = BLOCK_COMMENT_DELIMITERS.get(extension, (None, None))
+
+    comment_lines = 0
+    in_block = False
+    for line in code.splitlines():
+        stripped = line.strip()
+        if in_block:
+            comment_lines += 1
+            in_block = block_end not in stripped
+        elif block_start and stripped.startswith(block_start):
+            comment_lines += 1
+            in_block = block_end not in stripped[len(block_start):]
+        elif pattern and pattern.match(line):
+            comment_lines += 1
+    return comment_lines
+
+def count_python_comment_lines(code: str) -> int:
+    """Counts lines holding a '#' comment token (including trailing comments) with tokenize."""
+    try:
+        return len({
+            token.start[0]
+            for token in tokenize.generate_tokens(io.StringIO(code).readline)
+            if token.type == tokenize.COMMENT
+        })
+    except (tokenize.TokenError, SyntaxError):
+        return count_comment_lines(code, '.py')
+
+def analyze_python_code(code: str) -> Dict[str, Any]:
+    """One ast.parse + PythonMetricsVisitor pass and one tokenize pass over a Python module."""
     try:
-        # The base complexity starts at 1 (for the function/module itself)
-        cc = 1
         tree = ast.parse(code)
-        
-        for node in ast.walk(tree):
-            cc += calculate_cyclomatic_complexity(node)
-        
-        return cc
+        visitor = PythonMetricsVisitor()
+        visitor.visit(tree)
+        metrics = {
+            'complexity': visitor.complexity,
+            'docstring_lines': visitor.docstring_lines,
+            'imports': sorted(visitor.imports),
+            'symbols': visitor.symbols,
+        }
     except SyntaxError:
         # Handle cases where the code is not valid Python syntax (e.g., HTML, JS)
         # We return 1 as a baseline or a simple count based on keywords
-        return 1 + code.count('<div') + code.count('<section') # A basic guess for HTML/Markup structure
+        metrics = {
+            'complexity': 1 + code.count('<div') + code.count('<section'), # A basic guess for HTML/Markup structure
+            'docstring_lines': 0, 'imports': [], 'symbols': []
+        }
     except Exception:
-        return 1
+        metrics = {'complexity': 1, 'docstring_lines': 0, 'imports': [], 'symbols': []}
+
+    metrics['comment_lines'] = count_python_comment_lines(code)
+    return metrics
+
+def get_cyclomatic_complexity(code: str) -> int:
+    """Calculates Cyclomatic Complexity for the entire code string."""
+    return analyze_python_code(code)['complexity']
 
 def analyze_file(file_path: str) -> Dict[str, Any]:
     """Performs static analysis (LOC, CC) on a single file."""
@@ -54,41 +203,152 @@ def analyze_file(file_path: str) -> Dict[str, Any]:
     except Exception:
         return {'loc': 0, 'complexity': 1} # Cannot read file
 
+    return analyze_code(code, file_path)
+
+def analyze_file_with_contents(file_path: str) -> Tuple[Dict[str, Any], Optional[bytes]]:
+    """analyze_file that also returns the raw contents, for a FileIndex to keep (see file_index)."""
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    except Exception:
+        return {'loc': 0, 'complexity': 1}, None
+
+    return analyze_code(data.decode('utf-8', errors='ignore'), file_path), data
+
+def analyze_code(code: str, file_path: str) -> Dict[str, Any]:
+    """Performs static analysis (LOC, CC, comments, and for Python: symbols and imports) on file contents."""
     loc = len(code.splitlines())
-    complexity = 1
-    
+
     if file_path.endswith('.py'):
-        complexity = get_cyclomatic_complexity(code)
-    else:
-        # Use a simple line-based or keyword-based complexity for non-Python files
-        # Example: count functions/classes/large blocks in other languages
-        complexity = 1 + code.count('function ') + code.count('class ') + code.count('if (')
+        return {'loc': loc, **analyze_python_code(code)}
+
+    # Use a simple line-based or keyword-based complexity for non-Python files
+    # Example: count functions/classes/large blocks in other languages
+    complexity = 1 + code.count('function ') + code.count('class ') + code.count('if (')
         
     return {
         'loc': loc,
-        'complexity': complexity
+        'complexity': complexity,
+        'comment_lines': count_comment_lines(code, os.path.splitext(file_path)[1])
     }
 
-def run_static_analysis(repo_path: str) -> Dict[str, Dict[str, Any]]:
-    """Analyzes all relevant files in the repository."""
-    all_file_data: Dict[str, Dict[str, Any]] = {}
-    
-    for root, _, files in os.walk(repo_path):
-        # Skip the temporary .git directory
-        if '.git' in root:
-            continue
-            
-        for file_name in files:
-            if file_name.endswith(ANALYZE_EXTENSIONS):
-                file_path = os.path.join(root, file_name)
-                # Get path relative to the repository root
-                relative_path = os.path.relpath(file_path, repo_path)
-                
-                # Run the static analysis
-                analysis_results = analyze_file(file_path)
-                
-                # Only store files with meaningful content
-                if analysis_results['loc'] > 0:
-                    all_file_data[relative_path] = analysis_results
+def _analyze_files(source, paths: List[str], workers: int) -> List[Dict[str, Any]]:
+    """Runs the analysis over the paths, in a process pool when worthwhile."""
+    use_pool = workers > 1 and len(paths) >= PARALLEL_MIN_FILES
+    # A few chunks per worker keeps the pool balanced without per-file IPC overhead
+    chunksize = max(1, len(paths) // (workers * 4))
+
+    # Working tree (plain or behind a FileIndex): workers read the files themselves, in parallel
+    if source.root is not None:
+        file_paths = [os.path.join(source.root, *path.split('/')) for path in paths]
+        remember = getattr(source, 'remember', None)
+        if remember is None:
+            if use_pool:
+                with ProcessPoolExecutor(max_workers=workers, mp_context=POOL_CONTEXT) as executor:
+                    return list(executor.map(analyze_file, file_paths, chunksize=chunksize))
+            return [analyze_file(file_path) for file_path in file_paths]
+
+        # A FileIndex gets the contents back, so later stages don't read the files again
+        if use_pool:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=POOL_CONTEXT) as executor:
+                outputs = list(executor.map(analyze_file_with_contents, file_paths, chunksize=chunksize))
+        else:
+            outputs = [analyze_file_with_contents(file_path) for file_path in file_paths]
+        for path, (_, data) in zip(paths, outputs):
+            if data is not None:
+                remember(path, data)
+        return [analysis_results for analysis_results, _ in outputs]
+
+    # Object database: blobs stream through one git process, so read in batches and ship contents to the workers
+    results: List[Dict[str, Any]] = []
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=POOL_CONTEXT) if use_pool else None
+    try:
+        for start in range(0, len(paths), SOURCE_BATCH_FILES):
+            batch = paths[start:start + SOURCE_BATCH_FILES]
+            codes = [source.read_text(path) or '' for path in batch]
+            if executor is not None:
+                results.extend(executor.map(analyze_code, codes, batch, chunksize=max(1, chunksize // 4)))
+            else:
+                results.extend(analyze_code(code, path) for code, path in zip(codes, batch))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return results
+
+def run_static_analysis(repo_path: str, workers: Optional[int] = None, source=None) -> FileTable:
+    """
+    Analyzes all relevant files in the repository.
+
+    Files are read through `source` (see repo_source); by default the working tree,
+    or the object database for bare repositories. Files whose git blob was analyzed
+    before (in this or any other repository) are served from the shared blob cache
+    without being read. The rest are fanned out over a process pool in chunked batches
+    when there are enough of them; from a working tree the workers read the files
+    themselves (handing the contents to `source` if it is a FileIndex). Results are merged in sorted path order, so the
+    output is identical to a serial run. Returns them as a FileTable (see file_table).
+    """
+    all_file_data = FileTable()
+    workers = STATIC_ANALYSIS_WORKERS if workers is None else workers
+    owns_source = source is None
+    if owns_source:
+        source = open_source(repo_path)
+
+    cache_conn = None
+    try:
+        entries = sorted(
+            (entry for entry in source.entries()
+             # Skip anything inside .git directories
+             if entry.path.endswith(ANALYZE_EXTENSIONS) and '.git' not in os.path.dirname(entry.path)),
+            key=lambda entry: entry.path
+        )
+        paths = [entry.path for entry in entries]
+        # Get path relative to the repository root
+        relative_paths = [path.replace('/', os.sep) for path in paths]
+
+        # Cache keys: blob id + extension (analysis depends on the language) under a versioned namespace
+        cache_conn = open_blob_cache() if USE_BLOB_CACHE else None
+        namespace = f"static:{ANALYZER_VERSION}"
+        cache_keys: Dict[str, str] = {}
+        cached: Dict[str, Any] = {}
+        if cache_conn is not None:
+            blob_ids = {entry.path: entry.blob_id for entry in entries if entry.blob_id}
+            if not blob_ids:
+                blob_ids = list_blob_ids(repo_path)
+            for path, relative_path in zip(paths, relative_paths):
+                blob_id = blob_ids.get(path)
+                if blob_id:
+                    cache_keys[relative_path] = f"{blob_id}{os.path.splitext(relative_path)[1]}"
+            cached = get_cached(cache_conn, namespace, set(cache_keys.values()))
+
+        # Run the static analysis on cache misses only
+        misses = [
+            index for index, relative_path in enumerate(relative_paths)
+            if cache_keys.get(relative_path) not in cached
+        ]
+        computed = _analyze_files(source, [paths[index] for index in misses], workers)
+        results: List[Optional[Dict[str, Any]]] = [
+            cached.get(cache_keys.get(relative_path)) for relative_path in relative_paths
+        ]
+        for index, analysis_results in zip(misses, computed):
+            results[index] = analysis_results
+
+        if cache_conn is not None:
+            put_cached(cache_conn, namespace, [
+                (cache_keys[relative_paths[index]], results[index])
+                for index in misses if relative_paths[index] in cache_keys
+            ])
+            print(f"🗃️ Static analysis cache: {len(relative_paths) - len(misses)} hits, {len(misses)} misses.")
+    finally:
+        if cache_conn is not None:
+            cache_conn.close()
+        if owns_source:
+            source.close()
+
+    # Only store files with meaningful content
+    all_file_data.update_files(
+        (relative_path, analysis_results)
+        for relative_path, analysis_results in zip(relative_paths, results)
+        if analysis_results['loc'] > 0
+    )
                     
-    return all_file_data
\ No newline at end of file
+    return all_file_data
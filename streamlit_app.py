@@ -4,8 +4,13 @@ import pandas as pd
 
 from typing import Dict, Any, List, Tuple
 
-from git_debt_analyzer import run_analysis_pipeline
-from report_generator import security_keyword_scan
+from git_debt_analyzer import run_analysis_pipeline, remove_checkout
+from repo_cloner import clone_repository
+from file_index import FileIndex, build_file_index
+from file_table import iter_files
+from report_generator import security_keyword_scan, HOTSPOT_REPORT_LIMIT
+from hotspot_index import select_hotspots
+from git_history_analyzer import CHURN_WINDOWS_DAYS
 from security_analyzer import analyze_repo as run_security_analysis
 from gemini_integration import (
     generate_code_analysis_summary,
@@ -14,11 +19,12 @@ from gemini_integration import (
 )
 
 
-def build_tables_from_data(all_file_data: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+def build_tables_from_data(all_file_data: Dict[str, Dict[str, Any]], file_index: FileIndex | None = None) -> Dict[str, Any]:
     """
     Build in‑memory table structures from the aggregated analysis data.
     This mirrors the core tables printed by generate_cli_report, but returns
     them as Python lists that Streamlit can render as DataFrames.
+    The security keyword table reads files through `file_index` when given.
     """
     tables: Dict[str, Any] = {}
 
@@ -29,10 +35,8 @@ def build_tables_from_data(all_file_data: Dict[str, Dict[str, Any]]) -> Dict[str
 
     files = [
         (path, data)
-        for path, data in all_file_data.items()
-        if not path.startswith("_")
-        and isinstance(data, dict)
-        and data.get("loc", 0) > 0
+        for path, data in iter_files(all_file_data)
+        if data.get("loc", 0) > 0
         and "risk_score" in data
     ]
 
@@ -131,7 +135,7 @@ def build_tables_from_data(all_file_data: Dict[str, Dict[str, Any]]) -> Dict[str
     # 9. Security keyword matches using the local repo path (if available)
     if isinstance(local_repo_path, str) and local_repo_path:
         try:
-            security_data, total_matches = security_keyword_scan(local_repo_path)
+            security_data, total_matches = security_keyword_scan(local_repo_path, source=file_index)
             security_rows = [
                 {"file_path": row[0], "keyword_matches": row[1]}
                 for row in security_data
@@ -174,7 +178,10 @@ def build_tables_from_data(all_file_data: Dict[str, Dict[str, Any]]) -> Dict[str
             "file_path": path,
             "commit_count": commit_count,
             "total_churn": churn,
-            "avg_churn_per_commit": churn / commit_count if commit_count > 0 else 0
+            "avg_churn_per_commit": churn / commit_count if commit_count > 0 else 0,
+            # Recent activity: churn in each trailing window and decay-weighted churn
+            **{f"churn_{days}d": data.get(f"churn_{days}d", 0) for days in CHURN_WINDOWS_DAYS},
+            "decayed_churn": round(data.get("decayed_churn", 0.0), 1)
         })
     change_frequency.sort(key=lambda x: x["commit_count"], reverse=True)
     tables["change_frequency"] = change_frequency
@@ -205,10 +212,12 @@ def build_tables_from_data(all_file_data: Dict[str, Dict[str, Any]]) -> Dict[str
         bus_factor_data.append({
             "file_path": path,
             "unique_contributors": unique_authors,
+            "bus_factor": data.get("bus_factor", 0),
+            "ownership_entropy": round(data.get("ownership_entropy", 0.0), 3),
             "risk_score": data.get("risk_score", 0),
             "loc": data.get("loc", 0)
         })
-    bus_factor_data.sort(key=lambda x: (x["unique_contributors"], -x["risk_score"]))
+    bus_factor_data.sort(key=lambda x: (x["bus_factor"], x["unique_contributors"], -x["risk_score"]))
     tables["bus_factor"] = bus_factor_data
 
     # NEW FEATURE 2: Contribution Distribution
@@ -246,6 +255,11 @@ def build_tables_from_data(all_file_data: Dict[str, Dict[str, Any]]) -> Dict[str
     knowledge_concentration.sort(key=lambda x: x["concentration_risk"], reverse=True)
     tables["knowledge_concentration"] = knowledge_concentration
 
+    # Most complex functions, straight from the pipeline's hotspot index
+    tables["function_hotspots"] = select_hotspots(
+        all_file_data.get("_hotspots", []), limit=HOTSPOT_REPORT_LIMIT, kind="function"
+    )
+
     return tables
 
 
@@ -275,26 +289,43 @@ def main():
         with st.spinner("🔄 Cloning repository and running analysis. This may take a few minutes..."):
             status_text.text("Step 1/3: Cloning repository and analyzing code...")
             progress_bar.progress(20)
-            
-            try:
-                # Technical debt analysis
-                all_file_data = run_analysis_pipeline(repo_url.strip())
-                tables = build_tables_from_data(all_file_data)
-            except Exception as e:
-                st.error(f"❌ Technical debt analysis failed: {e}")
-                st.code(traceback.format_exc())
+
+            # One checkout serves both the debt pipeline and the security analyzer
+            repo_path = clone_repository(repo_url.strip())
+            if not repo_path:
+                st.error("❌ Cloning failed. Check the repository URL and access rights.")
                 return
 
-            status_text.text("Step 2/3: Running security analysis...")
-            progress_bar.progress(60)
-            
-            # Run the standalone security analyzer as well (separate clone and tools)
-            security_results: Dict[str, Any] | None = None
+            file_index: FileIndex | None = None
             try:
-                security_results = run_security_analysis(repo_url.strip(), return_data=True)
-            except Exception as e:
-                # We keep tech-debt results even if security scan fails
-                st.warning(f"⚠️ Security analyzer failed: {e}")
+                # ...and one file index, so each file is read at most once across all scanners
+                file_index = build_file_index(repo_path)
+
+                try:
+                    # Technical debt analysis
+                    all_file_data = run_analysis_pipeline(repo_url.strip(), repo_path=repo_path, file_index=file_index)
+                    tables = build_tables_from_data(all_file_data, file_index)
+                except Exception as e:
+                    st.error(f"❌ Technical debt analysis failed: {e}")
+                    st.code(traceback.format_exc())
+                    return
+
+                status_text.text("Step 2/3: Running security analysis...")
+                progress_bar.progress(60)
+
+                # Run the standalone security analyzer on the same checkout
+                security_results: Dict[str, Any] | None = None
+                try:
+                    security_results = run_security_analysis(
+                        repo_url.strip(), return_data=True, repo_path=repo_path, file_index=file_index
+                    )
+                except Exception as e:
+                    # We keep tech-debt results even if security scan fails
+                    st.warning(f"⚠️ Security analyzer failed: {e}")
+            finally:
+                if file_index is not None:
+                    file_index.close()
+                remove_checkout(repo_path)
 
             status_text.text("Step 3/3: Generating AI insights...")
             progress_bar.progress(90)
@@ -402,6 +433,12 @@ def main():
 
             st.markdown("---")
 
+            # Most Complex Functions
+            st.subheader("🧩 Most Complex Functions")
+            st.dataframe(tables.get("function_hotspots", []), use_container_width=True)
+
+            st.markdown("---")
+
             # Highest Risk Files
             st.subheader("🔥 Highest‑Risk Files")
             risk_rows = tables.get("risk", [])
@@ -541,18 +578,18 @@ def main():
 
             # NEW FEATURE 1: Bus Factor Analysis
             st.subheader("🚌 Bus Factor Analysis")
-            st.write("Identifies files with low contributor diversity (high bus factor risk)")
+            st.write("Identifies files with low contributor diversity. Bus factor = minimum authors covering 50% of a file's commits; ownership entropy runs from 0 (single owner) to 1 (evenly shared).")
             bus_factor_data = tables.get("bus_factor", [])
             if bus_factor_data:
                 # Filter files with low contributor count and high risk
-                high_risk_bus = [f for f in bus_factor_data if f["unique_contributors"] <= 2 and f["risk_score"] > 50]
+                high_risk_bus = [f for f in bus_factor_data if f["bus_factor"] == 1 and f["risk_score"] > 50]
                 if high_risk_bus:
-                    st.warning(f"⚠️ Found {len(high_risk_bus)} files with high bus factor risk (≤2 contributors, risk >50)")
+                    st.warning(f"⚠️ Found {len(high_risk_bus)} files with high bus factor risk (bus factor 1, risk >50)")
                     df_bus = pd.DataFrame(high_risk_bus[:20])
                     st.dataframe(df_bus, use_container_width=True)
                     col_bus1, col_bus2 = st.columns(2)
                     with col_bus1:
-                        st.bar_chart(df_bus.set_index("file_path")["unique_contributors"])
+                        st.bar_chart(df_bus.set_index("file_path")["ownership_entropy"])
                     with col_bus2:
                         st.bar_chart(df_bus.set_index("file_path")["risk_score"])
                 else:
@@ -0,0 +1,43 @@
+from dependency_analyzer import build_module_index, resolve_dependency
+
+PATHS = [
+    'main.py',
+    'helpers.py',
+    'app/__init__.py',
+    'app/models.py',
+    'app/utils/__init__.py',
+    'app/utils/json.py',
+    'app/core/logging.py',  # Namespace directory, no __init__.py
+    'tools/typing.py',
+    'src/service/__init__.py',
+    'src/service/api.py',
+    'backend/store/__init__.py',
+    'backend/store/db.py',
+]
+
+
+def resolve(dep, importer='main.py'):
+    return resolve_dependency(dep, importer, '.py', build_module_index(PATHS))
+
+
+def test_stdlib_imports_do_not_resolve_to_local_files_with_the_same_name():
+    assert resolve('json') is None
+    assert resolve('logging') is None
+    assert resolve('typing.Dict') is None
+    assert resolve('json', importer='app/models.py') is None
+
+
+def test_absolute_imports_resolve_from_package_roots():
+    assert resolve('helpers') == 'helpers.py'
+    assert resolve('app') == 'app/__init__.py'
+    assert resolve('app.utils.json') == 'app/utils/json.py'
+    assert resolve('app.core.logging') == 'app/core/logging.py'
+    assert resolve('app.models.User') == 'app/models.py'
+    assert resolve('tools.typing') == 'tools/typing.py'
+    assert resolve('service.api') == 'src/service/api.py'
+    assert resolve('store.db') == 'backend/store/db.py'
+
+
+def test_relative_imports_resolve_next_to_the_importer():
+    assert resolve('.json', importer='app/utils/__init__.py') == 'app/utils/json.py'
+    assert resolve('..models', importer='app/utils/json.py') == 'app/models.py'
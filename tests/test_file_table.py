@@ -0,0 +1,29 @@
+from file_table import FileTable
+
+SYMBOLS = [
+    ['class', 'Parser', 3, 40, 6, 35],
+    ['function', 'Parser.parse', 10, 30, 5, 18],
+    ['function', 'émettre', 42, 44, 1, 3],
+]
+
+
+def test_list_columns_round_trip_through_csr_storage():
+    table = FileTable()
+    table.add_file('a.py', {'loc': 44, 'imports': ['os', 'app.models'], 'symbols': SYMBOLS,
+                            'author_commits': {'a@x': 3, 'b@x': 1}})
+    table.add_file('b.py', {'loc': 2, 'imports': [], 'symbols': []})
+    table.add_file('c.js', {'loc': 9})
+    table['b.py']['imports'] = ['app.models']
+
+    assert table['a.py']['imports'] == ['os', 'app.models']
+    assert table['a.py']['symbols'] == SYMBOLS
+    assert table['a.py']['author_commits'] == {'a@x': 3, 'b@x': 1}
+    assert table['b.py']['imports'] == ['app.models'] and table['b.py']['symbols'] == []
+    assert 'imports' not in table['c.js'] and table['c.js'].get('symbols') is None
+    assert table.import_names == ['os', 'app.models']
+
+    del table['a.py']
+    assert table.to_dict() == {
+        'b.py': {'loc': 2, 'imports': ['app.models'], 'symbols': []},
+        'c.js': {'loc': 9},
+    }
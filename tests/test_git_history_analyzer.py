@@ -0,0 +1,55 @@
+import os
+import subprocess
+
+import pytest
+
+import git_history_analyzer
+
+DAY = 86400
+BASE_TIME = 1_600_000_000
+
+
+def git(repo, *args, env=None):
+    subprocess.run(['git', '-C', str(repo), *args], check=True, capture_output=True, env=env)
+
+
+@pytest.fixture
+def rebased_repo(tmp_path):
+    """A history whose committer dates were rewritten (as by a rebase) long after the author dates."""
+    git(tmp_path, 'init', '-q')
+    for index in range(12):
+        with open(tmp_path / f'module_{index % 3}.py', 'a') as f:
+            f.write(f'value_{index} = {index}\n')
+        author_time = BASE_TIME + index * 10 * DAY
+        env = {
+            **os.environ,
+            'GIT_AUTHOR_NAME': 'dev', 'GIT_AUTHOR_EMAIL': f'dev{index % 2}@example.com',
+            'GIT_COMMITTER_NAME': 'dev', 'GIT_COMMITTER_EMAIL': 'dev@example.com',
+            'GIT_AUTHOR_DATE': f'@{author_time} +0000',
+            # The newest commits were "rebased" 200 days after they were written
+            'GIT_COMMITTER_DATE': f'@{author_time + (200 * DAY if index >= 9 else 0)} +0000',
+        }
+        git(tmp_path, 'add', '.')
+        git(tmp_path, 'commit', '-q', '-m', f'fix bug {index}' if index % 4 == 0 else f'change {index}', env=env)
+    return tmp_path
+
+
+def test_sharded_history_matches_single_pass_when_author_and_committer_dates_differ(rebased_repo, monkeypatch):
+    monkeypatch.setattr(git_history_analyzer, 'HISTORY_SHARD_MIN_COMMITS', 1)
+    tracked_paths = [f'module_{index}.py' for index in range(3)]
+
+    runs, reference_time = git_history_analyzer.list_commit_shards(str(rebased_repo), 'HEAD', 3)
+    assert len(runs) == 3
+    assert reference_time == BASE_TIME + 11 * 10 * DAY  # Author date of HEAD, not its committer date
+
+    single_pass = git_history_analyzer.accumulate_history(
+        git_history_analyzer.iter_log_commits(str(rebased_repo)), tracked_paths
+    )
+    sharded = git_history_analyzer.accumulate_history_sharded(str(rebased_repo), tracked_paths, 3)
+    assert sharded.keys() == single_pass.keys()
+    for path in tracked_paths:
+        for field, value in single_pass[path].items():
+            if isinstance(value, float):
+                assert sharded[path][field] == pytest.approx(value), (path, field)
+            else:
+                assert sharded[path][field] == value, (path, field)
@@ -0,0 +1,30 @@
+import io
+import re
+
+import pytest
+
+import security_analyzer
+
+
+def per_line_secrets(content: str):
+    """The original scanner: each pattern tried on each line of a text-mode file, first match wins."""
+    found = []
+    for line_number, line in enumerate(io.StringIO(content, newline=None), 1):
+        for pattern_name, regex in security_analyzer.SECRET_PATTERNS.items():
+            if re.search(regex, line, re.IGNORECASE):
+                found.append((line_number, pattern_name))
+                break
+    return found
+
+
+@pytest.mark.parametrize('separator', ['\x0c', '\x0b', '\x1c', '\x1d', '\x1e', '\x85', '\u2028', '\u2029'])
+def test_find_secret_lines_only_breaks_lines_on_newlines(separator):
+    content = f"import os\n\n\n{separator}\npassword = 'hunter2'\n"
+    assert security_analyzer.find_secret_lines(content) == [(5, 'GENERIC_PASSWORD')]
+    assert security_analyzer.find_secret_lines(content) == per_line_secrets(content)
+
+
+def test_find_secret_lines_counts_lines_like_text_mode():
+    content = "a = 1\r\nb = 2\rc = 3\x0cpassword = 'x'\ntoken = \"y\"\r\n"
+    assert security_analyzer.find_secret_lines(content) == [(3, 'GENERIC_PASSWORD'), (4, 'GENERIC_PASSWORD')]
+    assert security_analyzer.find_secret_lines(content) == per_line_secrets(content)